@@ -0,0 +1,169 @@
+"""Mesure la construction et la résolution du modèle sur des équipes synthétiques.
+
+    python -m benchmarks.bench --sizes 10 25 50 100 200 --subsets ablation --output bench.csv
+    python -m benchmarks.bench --encodings linear compact --subsets full --output encodings.csv
+    python -m benchmarks.bench --symmetry off on --sizes 25 50 100 --profile balanced --subsets full
+
+Chaque cas (taille d'équipe x combinaison de règles x encodage x bris de symétrie) est
+résolu dans un processus neuf, pour que la mémoire relevée (pic de RSS) ne dépende
+pas des cas précédents.
+Les résultats sont écrits en CSV (une ligne par cas) ou en JSON (avec le détail
+par bloc de contraintes).
+"""
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import resource
+import sys
+from dataclasses import asdict, replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from scheduler import (ENCODINGS, PROFILES, RULES, Employees, get_profile, normalize_rules,
+                       role_dict, rules_key, solve)
+
+DEFAULT_SIZES = [10, 25, 50, 100, 200]
+
+
+def synthetic_roster(size: int) -> Employees:
+    """Équipe de `size` agents répartis à tour de rôle entre les squads"""
+    teams = list(role_dict)
+    roster = {}
+    for i in range(size):
+        team = teams[i % len(teams)]
+        roster[f"{team}{i // len(teams) + 1:03}"] = {"team": team, "roles": list(role_dict[team])}
+    return roster
+
+
+def rule_subsets(mode: str) -> List[Tuple[str, Dict[str, bool]]]:
+    """Combinaisons de règles à mesurer, avec un nom court pour chacune
+
+    - "full" : toutes les règles ;
+    - "ablation" : toutes les règles, puis toutes sauf une (-règle) ;
+    - "single" : aucune règle, puis une seule règle à la fois (+règle) ;
+    - "all" : toutes les combinaisons de cases à cocher.
+    """
+    none = {rule: False for rule in RULES}
+    if mode == "full":
+        subsets = [("all", {})]
+    elif mode == "ablation":
+        subsets = [("all", {})] + [(f"-{rule}", {rule: False}) for rule in RULES]
+    elif mode == "single":
+        subsets = [("none", none)] + [(f"+{rule}", {**none, rule: True}) for rule in RULES]
+    elif mode == "all":
+        subsets = []
+        for values in itertools.product([True, False], repeat=len(RULES)):
+            rules = dict(zip(RULES, values))
+            subsets.append(("+".join(r for r, on in rules.items() if on) or "none", rules))
+    else:
+        raise ValueError(f"Mode inconnu : {mode} (disponibles : full, ablation, single, all)")
+    # Une règle désactivée par dépendance donne le même modèle qu'une autre combinaison.
+    unique, seen = [], set()
+    for name, rules in subsets:
+        key = rules_key(normalize_rules(rules))
+        if key not in seen:
+            seen.add(key)
+            unique.append((name, rules))
+    return unique
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss est en kilo-octets sous Linux, en octets sous macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """Construit et résout un cas ; renvoie ses mesures"""
+    roster = synthetic_roster(case["size"])
+    result = solve(roster, case["rules"], case["profile"], use_cache=False, warm_start=False,
+                   instrument=True, encoding=case["encoding"], symmetry=case["symmetry"])
+    blocks = result.build_report or []
+    stats = result.solver_stats
+    return {
+        "size": case["size"],
+        "subset": case["subset"],
+        "encoding": case["encoding"],
+        "symmetry": case["symmetry"],
+        "symmetric_employees": result.symmetric_employees,
+        "status": result.status_name,
+        "build_time": round(sum(b.build_time for b in blocks), 4),
+        "solve_time": round(stats.wall_time, 4),
+        "presolve_time": round(stats.presolve_time, 4) if stats.presolve_time is not None else None,
+        "wall_time": round(result.wall_time, 4),
+        "variables": sum(b.variables for b in blocks),
+        "constraints": sum(b.constraints for b in blocks),
+        "num_branches": stats.num_branches,
+        "num_conflicts": stats.num_conflicts,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "blocks": [asdict(b) for b in blocks],
+    }
+
+
+def run_cases(cases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Lance les cas l'un après l'autre, chacun dans un processus neuf"""
+    rows = []
+    with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+        for row in pool.imap(run_case, cases):
+            symmetry = "symétrie" if row["symmetry"] else ""
+            print(f"{row['size']:>4} agents  {row['subset']:<22} {row['encoding']:<8} {symmetry:<8} "
+                  f"{row['status']:<10} "
+                  f"construction {row['build_time']:.2f} s  résolution {row['solve_time']:.2f} s  "
+                  f"{row['variables']} var.  {row['constraints']} contr.  {row['peak_rss_mb']} Mo",
+                  flush=True)
+            rows.append(row)
+    return rows
+
+
+def write_rows(rows: List[Dict[str, Any]], output: Path) -> None:
+    """Écrit les résultats en JSON (avec le détail par bloc) ou en CSV"""
+    output.parent.mkdir(parents=True, exist_ok=True)
+    if output.suffix.lower() == ".json":
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+        return
+    fields = [k for k in rows[0] if k != "blocks"] if rows else []
+    with open(output, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench",
+                                     description="Mesure du modèle sur des équipes synthétiques.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Tailles d'équipe (défaut : 10 25 50 100 200)")
+    parser.add_argument("--subsets", choices=["full", "ablation", "single", "all"],
+                        default="ablation", help="Combinaisons de règles (défaut : ablation)")
+    parser.add_argument("--encodings", nargs="+", choices=list(ENCODINGS), default=["linear"],
+                        help="Encodages des règles à comparer (défaut : linear)")
+    parser.add_argument("--symmetry", nargs="+", choices=["off", "on"], default=["off"],
+                        help="Sans et/ou avec bris de symétrie entre agents interchangeables "
+                             "(défaut : off)")
+    parser.add_argument("--profile", choices=list(PROFILES), default="fast")
+    parser.add_argument("--time-limit", type=float,
+                        help="Temps maximal par résolution (défaut : celui du profil)")
+    parser.add_argument("--output", type=Path, default=Path("benchmarks/results.csv"),
+                        help="Fichier .csv ou .json (défaut : benchmarks/results.csv)")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    profile = get_profile(args.profile)
+    if args.time_limit:
+        profile = replace(profile, max_time_in_seconds=args.time_limit)
+    cases = [{"size": size, "subset": name, "rules": rules, "profile": profile, "encoding": encoding,
+              "symmetry": symmetry == "on"}
+             for size in args.sizes for name, rules in rule_subsets(args.subsets)
+             for encoding in args.encodings for symmetry in args.symmetry]
+    write_rows(run_cases(cases), args.output)
+    print(f"{len(cases)} cas -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""Vérifie que les deux encodages des règles acceptent exactement les mêmes plannings.
+
+    python -m checks.encodings
+    python -m checks.encodings --days Monday Friday
+
+Pour un employé seul sur une journée, toutes les solutions du modèle sont
+énumérées avec l'encodage linéaire puis avec l'encodage compact (voir
+`engine.ENCODINGS`), règle par règle : "consecutive" sur un rôle Intercom,
+"phone_blocks" (avec la demi-journée sans téléphone dont il dépend) sur le
+téléphone. Les deux ensembles de solutions doivent être identiques. Le code de
+sortie est non nul en cas de différence.
+"""
+import argparse
+import sys
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from ortools.sat.python import cp_model
+
+from scheduler import RULES, build_model, days
+
+# (nom, rôles de l'employé, règles actives)
+CASES: List[Tuple[str, List[str], List[str]]] = [
+    ("consecutive", ["IC_Client"], ["consecutive"]),
+    ("phone_blocks", ["Téléphone"], ["half_day_no_phone", "phone_blocks"]),
+]
+
+
+class _Collector(cp_model.CpSolverSolutionCallback):
+    """Garde chaque solution : valeurs des variables de décision"""
+
+    def __init__(self, literals: List[Any]) -> None:
+        super().__init__()
+        self._literals = literals
+        self.solutions: Set[Tuple[bool, ...]] = set()
+
+    def on_solution_callback(self) -> None:
+        self.solutions.add(tuple(self.boolean_value(literal) for literal in self._literals))
+
+
+def solutions(roles: List[str], rules: Dict[str, bool], day: str, encoding: str) -> Set[Tuple[bool, ...]]:
+    """Toutes les solutions du modèle d'un employé seul sur la journée"""
+    employees = {"A": {"team": "Client", "roles": roles}}
+    sm = build_model(employees, rules, horizon=[day], encoding=encoding)
+    collector = _Collector(sm.literals)
+    solver = cp_model.CpSolver()
+    solver.parameters.enumerate_all_solutions = True
+    solver.parameters.num_workers = 1
+    solver.solve(sm.model, collector)
+    return collector.solutions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m checks.encodings",
+                                     description="Encodage linéaire contre encodage compact.")
+    parser.add_argument("--days", nargs="+", choices=days, default=days,
+                        help="Jours vérifiés (défaut : toute la semaine)")
+    parser.add_argument("--rules", nargs="+", choices=[name for name, _, _ in CASES],
+                        default=[name for name, _, _ in CASES], help="Règles vérifiées (défaut : toutes)")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    failed = 0
+    for name, roles, active in CASES:
+        if name not in args.rules:
+            continue
+        rules = {rule: rule in active for rule in RULES}
+        for day in args.days:
+            start = time.perf_counter()
+            linear = solutions(roles, rules, day, "linear")
+            compact = solutions(roles, rules, day, "compact")
+            same = linear == compact
+            failed += not same
+            print(f"{name:<14} {day:<10} {'ok' if same else 'ÉCHEC':<6} "
+                  f"{len(linear)} / {len(compact)} solutions ({time.perf_counter() - start:.1f} s)",
+                  flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""Vérifie que le modèle mis à jour (model_for) équivaut au modèle reconstruit (build_model).
+
+    python -m checks.incremental
+    python -m checks.incremental --encodings linear compact --roster employees.json
+
+Une suite de modifications de l'équipe (départ, arrivée, changement d'équipe,
+absence) est appliquée au modèle gardé par `model_for`, qui est alors mis à jour
+au lieu d'être reconstruit. À chaque étape, les deux modèles doivent donner le
+même statut, et la solution de chacun doit être acceptée par l'autre. Avec toutes
+les règles, l'équipe réduite n'a pas de planning : la suite est aussi vérifiée sans
+"phone_blocks". Le code de sortie est non nul en cas de désaccord.
+"""
+import argparse
+import copy
+import json
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ortools.sat.python import cp_model
+
+from scheduler import (ENCODINGS, PROFILES, ScheduleModel, ScheduleResult, SolveProfile,
+                       apply_previous, build_model, clear_cache, extract_grid, get_profile,
+                       normalize_employees, open_slots_mask, role_dict)
+from scheduler.engine import model_for
+
+Employees = Dict[str, Any]
+
+RULE_SETS: List[Tuple[str, Optional[Dict[str, bool]]]] = [
+    ("toutes les règles", None),
+    ("sans phone_blocks", {"phone_blocks": False}),
+]
+
+
+def edits(employees: Employees) -> List[Tuple[str, Callable[[Employees], None]]]:
+    """Les modifications appliquées l'une après l'autre à l'équipe"""
+    names = list(employees)
+    teams = list(role_dict)
+
+    def remove(e: Employees) -> None:
+        e.pop(names[1])
+
+    def add(e: Employees) -> None:
+        e["Nouvelle recrue"] = {"team": teams[-1], "roles": list(role_dict[teams[-1]])}
+
+    def change_team(e: Employees) -> None:
+        other = next(t for t in teams if t != e[names[2]]["team"])
+        e[names[2]] = {"team": other, "roles": list(role_dict[other])}
+
+    def absence(e: Employees) -> None:
+        e[names[3]]["unavailable"] = {"Wednesday": "all", "Friday": "afternoon"}
+
+    return [(f"départ de {names[1]}", remove), ("arrivée d'une recrue", add),
+            (f"{names[2]} change d'équipe", change_team), (f"absences de {names[3]}", absence)]
+
+
+def _solve(sm: ScheduleModel, profile: SolveProfile) -> Tuple[int, Optional[ScheduleResult]]:
+    solver = cp_model.CpSolver()
+    profile.apply(solver)
+    solver.parameters.random_seed = 0
+    status = solver.solve(sm.model)
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return status, None
+    grid = extract_grid(sm, solver)
+    return status, ScheduleResult(status=status, status_name=solver.status_name(status), wall_time=0.0,
+                                  profile=profile.name, employees=tuple(sm.employees), grid=grid,
+                                  open_mask=open_slots_mask(sm.employees))
+
+
+def accepts(sm: ScheduleModel, result: ScheduleResult, profile: SolveProfile) -> bool:
+    """Le modèle admet-il ce planning ? (toutes les affectations fixées)"""
+    apply_previous(sm, result, "fixed")
+    status, _ = _solve(sm, profile)
+    return status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+
+
+def check_step(employees: Employees, rules: Optional[Dict[str, bool]], encoding: str,
+               profile: SolveProfile) -> Tuple[bool, str]:
+    """Compare le modèle mis à jour et le modèle reconstruit pour cette équipe"""
+    updated = model_for(employees, rules, encoding)
+    cleared = updated.cleared_constraints
+    fresh = build_model(employees, rules, encoding=encoding)
+    updated_status, updated_result = _solve(updated, profile)
+    fresh_status, fresh_result = _solve(fresh, profile)
+    statuses = " / ".join(cp_model.CpSolverStatus(status).name
+                          for status in (updated_status, fresh_status))
+    # Aucune contrainte effacée : le modèle gardé vient d'être (re)construit.
+    summary = f"{statuses}, " + (f"mis à jour ({cleared} contraintes effacées)" if cleared
+                                 else "modèle reconstruit")
+    if cp_model.UNKNOWN in (updated_status, fresh_status):
+        return True, f"{summary} (non concluant : temps écoulé)"
+    if (updated_result is None) != (fresh_result is None):
+        return False, f"{summary} : statuts différents"
+    if updated_result is None:
+        return True, summary
+    # Chaque modèle est une copie à part : on peut y fixer la solution de l'autre.
+    if not accepts(fresh, updated_result, profile):
+        return False, f"{summary} : la solution du modèle mis à jour est refusée par le modèle reconstruit"
+    if not accepts(updated, fresh_result, profile):
+        return False, f"{summary} : la solution du modèle reconstruit est refusée par le modèle mis à jour"
+    return True, summary
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m checks.incremental",
+                                     description="Mise à jour du modèle contre reconstruction.")
+    parser.add_argument("--roster", type=Path, default=Path("employees.json"),
+                        help="Équipe de départ (défaut : employees.json)")
+    parser.add_argument("--encodings", nargs="+", choices=list(ENCODINGS), default=["linear"],
+                        help="Encodages à vérifier (défaut : linear)")
+    parser.add_argument("--profile", choices=list(PROFILES), default="balanced")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    profile = get_profile(args.profile)
+    with open(args.roster, encoding="utf-8") as f:
+        initial = normalize_employees(json.load(f))
+    failed = 0
+    for encoding in args.encodings:
+        for rules_name, rules in RULE_SETS:
+            clear_cache()
+            employees = copy.deepcopy(initial)
+            steps = [("équipe de départ", lambda e: None)] + edits(initial)
+            for name, edit in steps:
+                edit(employees)
+                ok, summary = check_step(employees, rules, encoding, profile)
+                failed += not ok
+                print(f"{encoding:<8} {rules_name:<18} {name:<32} {'ok' if ok else 'ÉCHEC':<6} "
+                      f"{summary}", flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""Moteur de planification du service client, utilisable sans Streamlit."""
+from .availability import PERIODS, Unavailability, availability_mask
+from .config import (NO_ROLE, ROLE_CODES, RULE_DEPENDENCIES, RULES, SOFT_WEIGHTS, afternoon_shifts,
+                     days, get_shifts_for_day, intercom_roles, morning_shifts, normalize_rules,
+                     normalize_soft, role_dict, roles, shifts)
+from .decompose import solve_decomposed
+from .diagnosis import Conflict, Diagnosis, diagnose, precheck
+from .jobs import MAX_CONCURRENT_SOLVES, JobQueue, SolveJob, diagnosis_key, job_key
+from .engine import (ENCODINGS, STABILITY_MODES, ScheduleModel, ScheduleResult, SolveControl,
+                     apply_previous, build_model, cached_result, changed_cells, clear_cache,
+                     extract_grid, add_rotation_fairness, last_solution, open_slots_mask, plan_weeks,
+                     request_key, rule_violations, rules_key, set_store, solve, solve_key)
+from .history import (COUNTERS, EARLY_PHONE, History, carried_counts, load_history, record_week,
+                      save_history, week_counts)
+from .profiles import DEFAULT_PROFILE, PROFILES, SolveProfile, get_profile
+from .profiling import BlockStats, BuildProfiler, SolverStats, solver_stats
+from .roster import Employees, infer_team, normalize_employees, team_index
+from .store import ScheduleStore, content_hash
+from .symmetry import add_symmetry_breaking, interchangeable_groups
+
+__all__ = [
+    "PERIODS", "Unavailability", "availability_mask",
+    "NO_ROLE", "ROLE_CODES", "RULE_DEPENDENCIES", "RULES", "SOFT_WEIGHTS", "afternoon_shifts",
+    "days", "get_shifts_for_day", "intercom_roles", "morning_shifts", "normalize_rules",
+    "normalize_soft", "role_dict", "roles", "shifts",
+    "ENCODINGS", "STABILITY_MODES", "ScheduleModel", "ScheduleResult", "SolveControl",
+    "apply_previous", "build_model", "cached_result", "changed_cells", "clear_cache", "extract_grid",
+    "add_rotation_fairness", "last_solution", "open_slots_mask", "plan_weeks", "request_key",
+    "rule_violations", "rules_key", "set_store", "solve", "solve_key",
+    "COUNTERS", "EARLY_PHONE", "History", "carried_counts", "load_history", "record_week",
+    "save_history", "week_counts",
+    "solve_decomposed",
+    "Conflict", "Diagnosis", "diagnose", "precheck",
+    "MAX_CONCURRENT_SOLVES", "JobQueue", "SolveJob", "diagnosis_key", "job_key",
+    "DEFAULT_PROFILE", "PROFILES", "SolveProfile", "get_profile",
+    "BlockStats", "BuildProfiler", "SolverStats", "solver_stats",
+    "Employees", "infer_team", "normalize_employees", "team_index",
+    "ScheduleStore", "content_hash",
+    "add_symmetry_breaking", "interchangeable_groups",
+]
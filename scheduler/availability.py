@@ -0,0 +1,67 @@
+"""Disponibilités des employés : absences, temps partiels et jours fériés.
+
+Chaque employé peut avoir une entrée "unavailable" : jour -> "all", "morning",
+"afternoon" ou liste de créneaux. Un jour férié est une absence de tout le monde :
+un créneau où personne n'est disponible est fermé et les règles de couverture ne
+s'y appliquent pas.
+"""
+from typing import Any, Dict, List, Union
+
+import numpy as np
+
+from .config import days, get_shifts_for_day, shifts
+
+# jour -> "all" | "morning" | "afternoon" | [créneaux]
+Unavailability = Dict[str, Union[str, List[str]]]
+
+# Les périodes d'indisponibilité, de part et d'autre de la pause déjeuner.
+PERIODS: Dict[str, List[str]] = {
+    "all": list(shifts),
+    "morning": [s for s in shifts if s < "12:30"],
+    "afternoon": [s for s in shifts if s >= "13:30"],
+}
+
+
+def normalize_unavailability(unavailable: Dict[str, Any]) -> Unavailability:
+    """Vérifie une entrée "unavailable" ; les jours sans indisponibilité sont retirés"""
+    normalized = {}
+    for d, spec in unavailable.items():
+        if d not in days:
+            raise ValueError(f"Jour inconnu : {d} (disponibles : {', '.join(days)})")
+        if isinstance(spec, str):
+            if spec not in PERIODS:
+                raise ValueError(f"Période inconnue : {spec} (disponibles : {', '.join(PERIODS)})")
+            normalized[d] = spec
+        elif spec:
+            unknown = set(spec) - set(shifts)
+            if unknown:
+                raise ValueError(f"Créneaux inconnus : {', '.join(sorted(unknown))}")
+            normalized[d] = sorted(spec)
+    return normalized
+
+
+def unavailable_shifts(unavailable: Unavailability, d: str) -> List[str]:
+    """Les créneaux du jour où l'employé n'est pas disponible"""
+    spec = unavailable.get(d, [])
+    return PERIODS[spec] if isinstance(spec, str) else spec
+
+
+# Créneaux travaillés de chaque jour (jour x créneau), d'après les horaires du service.
+OPENING_HOURS = np.array([[s in get_shifts_for_day(d) for s in shifts] for d in days])
+
+
+def employee_availability(employee: Dict[str, Any]) -> np.ndarray:
+    """Masque (jour x créneau) des créneaux où l'employé travaille"""
+    mask = OPENING_HOURS.copy()
+    unavailable = employee.get("unavailable", {})
+    for d_idx, d in enumerate(days):
+        for s in unavailable_shifts(unavailable, d):
+            mask[d_idx, shifts.index(s)] = False
+    return mask
+
+
+def availability_mask(employees: Dict[str, Dict[str, Any]]) -> np.ndarray:
+    """Masque (employé x jour x créneau) des créneaux travaillés, dans l'ordre de `employees`"""
+    if not employees:
+        return np.zeros((0, len(days), len(shifts)), dtype=bool)
+    return np.stack([employee_availability(employees[e]) for e in employees])
@@ -0,0 +1,223 @@
+"""Ligne de commande : générer des plannings sans Streamlit.
+
+    python -m scheduler solve --roster employees.json --rules rules.json --output planning.csv
+    python -m scheduler batch scenarios.json --output-dir plannings/ --workers 4
+    python -m scheduler solve --history historique.json --output semaine.csv
+    python -m scheduler solve --soft phone_coverage --soft phone_blocks=20
+
+Un fichier de règles est un objet JSON règle -> booléen (voir `config.RULES`) ;
+les règles absentes sont actives. Un fichier de scénarios est une liste d'objets
+{"name", "roster", "rules", "profile", "decompose", "encoding", "soft", "symmetry"} où "roster" et
+"rules" sont soit des chemins (relatifs au fichier de scénarios), soit
+directement les données.
+
+Avec --history, le planning est équilibré avec les semaines enregistrées dans le
+fichier, puis la semaine planifiée y est ajoutée.
+
+Avec --soft, une règle devient une préférence : elle peut être enfreinte,
+moyennant son poids (`config.SOFT_WEIGHTS` par défaut) par contrainte enfreinte.
+
+Quand il n'y a pas de planning, les conflits trouvés par le pré-contrôle sont
+affichés ; avec --diagnose, le solveur cherche sinon les règles en conflit.
+
+Avec --store, les plannings sont gardés dans une base SQLite : une demande déjà
+résolue (par la ligne de commande ou par l'application) y est relue.
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import RULES, SOFT_WEIGHTS, normalize_rules
+from .diagnosis import diagnose
+from .engine import ENCODINGS, ScheduleResult, set_store, solve
+from .history import load_history, record_week, save_history
+from .profiles import DEFAULT_PROFILE, PROFILES, get_profile
+from .views import assignment_table
+
+
+def load_json(path: Path) -> Any:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _resolve(value: Any, base_dir: Path) -> Any:
+    # Dans un scénario, une chaîne désigne un fichier JSON.
+    return load_json(base_dir / value) if isinstance(value, str) else value
+
+
+def soft_rule(value: str) -> Tuple[str, int]:
+    """Une règle souple donnée sous la forme RÈGLE ou RÈGLE=POIDS"""
+    rule, _, weight = value.partition("=")
+    if rule not in SOFT_WEIGHTS:
+        raise argparse.ArgumentTypeError(f"règle inconnue : {rule} (disponibles : {', '.join(RULES)})")
+    try:
+        return rule, int(weight) if weight else SOFT_WEIGHTS[rule]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"poids invalide : {weight}") from None
+
+
+def write_result(result: ScheduleResult, output: Path) -> None:
+    """Écrit le planning en CSV (une ligne par employé, jour et créneau travaillé) ou en JSON"""
+    output.parent.mkdir(parents=True, exist_ok=True)
+    if output.suffix.lower() == ".json":
+        payload = {"status": result.status_name,
+                   "wall_time": result.wall_time,
+                   "profile": result.profile,
+                   "violations": result.violations,
+                   "schedule": result.assignments}
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+    else:
+        assignment_table(result).to_csv(output, index=False)
+
+
+def run_scenario(scenario: Dict[str, Any]) -> Dict[str, Any]:
+    """Résout un scénario et écrit son planning ; renvoie un résumé"""
+    if scenario.get("store"):
+        # Dans le processus du scénario : la base est ouverte là où elle sert.
+        set_store(scenario["store"])
+    result = solve(scenario["roster"], scenario.get("rules"), scenario["profile"],
+                   use_cache=bool(scenario.get("store")),
+                   decompose=scenario.get("decompose", False),
+                   encoding=scenario.get("encoding", "linear"), soft=scenario.get("soft"),
+                   symmetry=scenario.get("symmetry", False))
+    summary = {"name": scenario["name"], "status": result.status_name,
+               "wall_time": round(result.wall_time, 3), "output": None}
+    if result.found and scenario.get("output"):
+        write_result(result, Path(scenario["output"]))
+        summary["output"] = scenario["output"]
+    return summary
+
+
+def run_batch(scenarios: List[Dict[str, Any]], workers: int) -> List[Dict[str, Any]]:
+    """Résout les scénarios dans un pool de processus, une résolution par processus"""
+    if workers <= 1:
+        return [run_scenario(scenario) for scenario in scenarios]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_scenario, scenarios))
+
+
+def _solve_command(args: argparse.Namespace) -> int:
+    roster = load_json(args.roster)
+    rules = load_json(args.rules) if args.rules else None
+    history = load_history(args.history) if args.history else None
+    soft = dict(args.soft or [])
+    if args.store:
+        set_store(args.store)
+    result = solve(roster, rules, args.profile, use_cache=bool(args.store), decompose=args.decompose,
+                   encoding=args.encoding, history=history, soft=soft, symmetry=args.symmetry)
+    print(f"{result.status_name} en {result.wall_time:.1f} s (profil {result.profile})")
+    for rule, count in (result.violations or {}).items():
+        if count:
+            print(f"Règle {rule} enfreinte {count} fois")
+    for conflict in result.conflicts or ():
+        print(f"Conflit : {conflict.describe()}")
+    if result.status_name == "INFEASIBLE" and not result.conflicts and args.diagnose:
+        # Les règles souples ne peuvent pas rendre le planning impossible.
+        hard = {rule: active and rule not in soft
+                for rule, active in normalize_rules(rules).items()}
+        diagnosis = diagnose(roster, hard, args.profile)
+        for conflict in diagnosis.conflicts:
+            print(f"Conflit : {conflict.describe()}")
+    if not result.found:
+        return 1
+    if args.history:
+        save_history(record_week(history, result), args.history)
+    if args.output:
+        write_result(result, args.output)
+    else:
+        assignment_table(result).to_csv(sys.stdout, index=False)
+    return 0
+
+
+def _batch_command(args: argparse.Namespace) -> int:
+    scenarios_path = args.scenarios
+    base_dir = scenarios_path.parent
+    workers = args.workers or os.cpu_count() or 1
+    scenarios = []
+    for i, entry in enumerate(load_json(scenarios_path)):
+        name = entry.get("name") or f"scenario-{i + 1}"
+        profile = get_profile(entry.get("profile") or args.profile)
+        # Plusieurs résolutions en parallèle : on partage les cœurs entre elles.
+        profile = replace(profile, num_workers=max(1, (os.cpu_count() or 1) // workers))
+        roster = _resolve(entry["roster"], base_dir) if "roster" in entry else load_json(args.roster)
+        scenarios.append({
+            "name": name,
+            "roster": roster,
+            "rules": _resolve(entry["rules"], base_dir) if "rules" in entry else None,
+            "profile": profile,
+            "decompose": entry.get("decompose", args.decompose),
+            "encoding": entry.get("encoding", args.encoding),
+            "soft": entry.get("soft"),
+            "symmetry": entry.get("symmetry", args.symmetry),
+            "store": str(args.store) if args.store else None,
+            "output": str(args.output_dir / f"{name}.{args.format}"),
+        })
+    failed = 0
+    for summary in run_batch(scenarios, workers):
+        print(f"{summary['name']}: {summary['status']} en {summary['wall_time']:.1f} s"
+              + (f" -> {summary['output']}" if summary["output"] else ""))
+        if summary["output"] is None:
+            failed += 1
+    return 1 if failed else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m scheduler",
+                                     description="Planning du service client, sans Streamlit.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    solve_parser = subparsers.add_parser("solve", help="Génère un planning")
+    solve_parser.add_argument("--roster", type=Path, default=Path("employees.json"),
+                              help="Fichier JSON des employés (défaut : employees.json)")
+    solve_parser.add_argument("--rules", type=Path,
+                              help=f"Fichier JSON règle -> booléen ({', '.join(RULES)})")
+    solve_parser.add_argument("--profile", choices=list(PROFILES), default=DEFAULT_PROFILE)
+    solve_parser.add_argument("--output", type=Path,
+                              help="Fichier .csv ou .json (défaut : CSV sur la sortie standard)")
+    solve_parser.add_argument("--decompose", action="store_true",
+                              help="Résoudre jour par jour en parallèle (grandes équipes)")
+    solve_parser.add_argument("--encoding", choices=list(ENCODINGS), default="linear",
+                              help="Formulation des règles (défaut : linear)")
+    solve_parser.add_argument("--symmetry", action="store_true",
+                              help="Ordonner les plannings des agents interchangeables")
+    solve_parser.add_argument("--history", type=Path,
+                              help="Historique JSON des semaines précédentes, complété avec "
+                                   "la semaine planifiée (créé s'il n'existe pas)")
+    solve_parser.add_argument("--soft", action="append", type=soft_rule, metavar="RÈGLE[=POIDS]",
+                              help="Règle à relâcher, avec son poids (répétable)")
+    solve_parser.add_argument("--diagnose", action="store_true",
+                              help="Sans planning, chercher les règles en conflit")
+    solve_parser.add_argument("--store", type=Path,
+                              help="Base SQLite des plannings déjà résolus (créée si besoin)")
+    solve_parser.set_defaults(func=_solve_command)
+
+    batch_parser = subparsers.add_parser("batch", help="Génère plusieurs plannings en parallèle")
+    batch_parser.add_argument("scenarios", type=Path, help="Fichier JSON des scénarios")
+    batch_parser.add_argument("--roster", type=Path, default=Path("employees.json"),
+                              help="Employés des scénarios qui n'en précisent pas")
+    batch_parser.add_argument("--profile", choices=list(PROFILES), default=DEFAULT_PROFILE)
+    batch_parser.add_argument("--output-dir", type=Path, default=Path("plannings"))
+    batch_parser.add_argument("--format", choices=["csv", "json"], default="csv")
+    batch_parser.add_argument("--decompose", action="store_true",
+                              help="Résoudre chaque scénario jour par jour")
+    batch_parser.add_argument("--encoding", choices=list(ENCODINGS), default="linear",
+                              help="Formulation des règles des scénarios qui n'en précisent pas")
+    batch_parser.add_argument("--symmetry", action="store_true",
+                              help="Ordonner les plannings des agents interchangeables")
+    batch_parser.add_argument("--workers", type=int,
+                              help="Nombre de résolutions simultanées (défaut : nombre de cœurs)")
+    batch_parser.add_argument("--store", type=Path,
+                              help="Base SQLite des plannings déjà résolus (créée si besoin)")
+    batch_parser.set_defaults(func=_batch_command)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,110 @@
+"""Données de référence du planning : jours, créneaux, équipes et règles."""
+from typing import Dict, List, Optional
+
+# Dict pour les rôles de chaque équipe:
+role_dict: Dict[str, List[str]] = {
+    "Client": ["Téléphone", "IC_Client", "Slack/tâches"],
+    "Facturation": ["Téléphone", "IC_Factu", "Slack/tâches"],
+}
+
+# Le rôle Intercom propre à chaque équipe.
+intercom_roles: Dict[str, str] = {
+    "Client": "IC_Client",
+    "Facturation": "IC_Factu",
+}
+
+# Les horaires sont de 8h30 à 18h le lundi, mardi, mercredi et jeudi ; 8h30 à 17h le vendredi.
+days: List[str] = ["Monday",
+                   "Tuesday",
+                   "Wednesday",
+                   "Thursday",
+                   "Friday"]
+
+# Le planning fonctionne avec des créneaux de 30 minutes.
+shifts: List[str] = [f"{t//60:02}:{t%60:02}" for t in range(510, 1080, 30)]
+roles: List[str] = sorted({r for team_roles in role_dict.values() for r in team_roles})
+
+# Codes des rôles dans les grilles de résultat (0 : aucun rôle).
+NO_ROLE = 0
+ROLE_CODES: Dict[str, int] = {r: code for code, r in enumerate(roles, start=1)}
+
+# Demi-journée sans téléphone (matin : avant 12h00, après-midi : après 12h00)
+morning_shifts: List[str] = [s for s in shifts if s in ['09:00', '09:30', '10:00',
+                                                        '10:30', '11:00', '11:30']]
+afternoon_shifts: List[str] = [s for s in shifts if s in ['13:30', '14:00', '14:30',
+                                                          '15:00', '15:30', '16:00',
+                                                          '16:30', '17:00', '17:30']]
+
+
+def get_shifts_for_day(d: str) -> List[str]:
+    """Renvoie les créneaux travaillés pour un jour donné"""
+    # Les heures non travaillées dans la journée sont
+    # - tous les jours entre 12h30 et 13h30
+    # - le lundi et le jeudi entre 12h et 12h30
+    # - le mercredi et le vendredi de 17h à 18h
+    day_shifts = [s for s in shifts if s not in ["12:30", "13:00"]]
+    if d in ["Wednesday", "Friday"]:
+        day_shifts = day_shifts[:-2]
+    elif d in ["Monday", "Thursday"]:
+        day_shifts = [s for s in day_shifts if s != "12:00"]
+    return day_shifts
+
+
+# Les règles activables depuis l'interface, dans l'ordre d'affichage.
+RULES: Dict[str, str] = {
+    "phone_coverage": "Il doit toujours y avoir 4 personnes au téléphone aux heures d'ouverture du standard",
+    "intercom_coverage": "Dans chaque squad, il doit toujours y avoir quelqu'un sur Intercom",
+    "slack_max": "Pour chaque squad, il doit toujours y avoir maximum 1 personne sur slack",
+    "slack_each": "Pour chaque squad, chaque personne doit avoir au moins 1 créneau Slack/tâches",
+    "half_day_no_phone": "Chaque personne doit avoir une demi-journée sans téléphone par semaine. Cette demi-journée ne peut pas être le vendredi après-midi.",
+    "slack_half_day": "Pour chaque squad, il doit y avoir au moins 2 créneaux Slack/tâches par demi-journée",
+    "equity": "Dans chaque squad, chaque personne doit passer à peu près le même temps au téléphone, sur Intercom, sur Slack/tâches et sur les tâches.",
+    "consecutive": "Pas + de 3 créneaux à la suite pour chaque rôle sauf Téléphone, maximum 4 créneaux.",
+    "phone_blocks": "Organisation du téléphone en 'créneaux' de 1h30 le matin / 2h l'après-midi.",
+}
+
+# Règles qui n'ont de sens que si une autre règle est active.
+RULE_DEPENDENCIES: Dict[str, str] = {
+    "phone_blocks": "half_day_no_phone",
+}
+
+
+def normalize_rules(rules: Optional[Dict[str, bool]] = None) -> Dict[str, bool]:
+    """Complète les règles manquantes (actives par défaut) et applique les dépendances"""
+    rules = rules or {}
+    unknown = set(rules) - set(RULES)
+    if unknown:
+        raise ValueError(f"Règles inconnues : {', '.join(sorted(unknown))}")
+    normalized = {rule: bool(rules.get(rule, True)) for rule in RULES}
+    for rule, required in RULE_DEPENDENCIES.items():
+        if not normalized[required]:
+            normalized[rule] = False
+    return normalized
+
+
+# Poids par défaut des règles souples : chaque contrainte enfreinte (un créneau
+# sans ses 4 personnes au téléphone, une journée sans Slack/tâches...) coûte ce poids.
+SOFT_WEIGHTS: Dict[str, int] = {
+    "phone_coverage": 100,
+    "intercom_coverage": 100,
+    "slack_max": 10,
+    "slack_each": 10,
+    "half_day_no_phone": 50,
+    "slack_half_day": 10,
+    "equity": 20,
+    "consecutive": 5,
+    "phone_blocks": 5,
+}
+assert list(SOFT_WEIGHTS) == list(RULES)
+
+
+def normalize_soft(soft: Optional[Dict[str, int]], rules: Dict[str, bool]) -> Dict[str, int]:
+    """Vérifie les règles souples (règle -> poids) et ne garde que les règles actives"""
+    soft = soft or {}
+    unknown = set(soft) - set(RULES)
+    if unknown:
+        raise ValueError(f"Règles inconnues : {', '.join(sorted(unknown))}")
+    for rule, weight in soft.items():
+        if int(weight) <= 0:
+            raise ValueError(f"Le poids de la règle {rule} doit être positif : {weight}")
+    return {rule: int(soft[rule]) for rule in RULES if rule in soft and rules[rule]}
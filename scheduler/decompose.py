@@ -0,0 +1,353 @@
+"""Résolution décomposée : un sous-problème par jour (et par squad quand c'est possible).
+
+Presque toutes les règles ne portent que sur une journée : les sous-problèmes sont
+résolus en parallèle, puis une coordination impose les deux règles qui lient la
+semaine (demi-journée sans téléphone, équité). Entre membres d'une squad qui ont
+les mêmes rôles et les mêmes disponibilités, les journées sont interchangeables
+pour toutes les règles du jour : la coordination choisit à qui revient chaque
+journée. Si une étape échoue, on retombe sur le modèle complet, en partant de ce
+qui a été trouvé.
+
+Une journée sans solution, même sans les contraintes ajoutées pour la
+coordination, prouve que toute la semaine est impossible : c'est souvent bien
+plus rapide à établir sur une journée que sur le modèle complet.
+"""
+import math
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+from .config import (NO_ROLE, ROLE_CODES, afternoon_shifts, days, morning_shifts,
+                     normalize_rules, role_dict, roles, shifts)
+from .engine import (MAX_NB_SHIFTS, ScheduleResult, SolveControl, _solve, add_spread_limit,
+                     apply_previous, build_model, changed_cells, extract_grid, open_slots_mask,
+                     spread_within)
+from .profiles import SolveProfile, get_profile
+from .roster import Employees, normalize_employees, team_index
+
+# Part du budget de temps réservée aux journées ; le reste va à la coordination
+# (et au modèle complet si le découpage n'aboutit pas).
+DAYS_SHARE = 0.5
+
+# Demi-journées qui peuvent être sans téléphone (pas le vendredi après-midi).
+HALF_DAYS: List[Tuple[str, str]] = ([(d, "morning") for d in days] +
+                                    [(d, "afternoon") for d in days if d != "Friday"])
+
+
+@dataclass(frozen=True)
+class SubProblem:
+    """Une partie du planning : un jour, pour une ou plusieurs squads"""
+    day: str
+    squads: Tuple[str, ...]
+
+
+def split(employees: Employees, rules: Dict[str, bool]) -> List[SubProblem]:
+    """Découpe la semaine en sous-problèmes indépendants"""
+    teams = [team for team, members in team_index(employees).items() if members]
+    # La couverture téléphonique compte les deux squads ensemble : on ne les
+    # sépare que si elle est désactivée.
+    groups = [tuple(teams)] if rules["phone_coverage"] else [(team,) for team in teams]
+    return [SubProblem(d, group) for d in days for group in groups]
+
+
+def no_phone_quotas(employees: Employees) -> Dict[Tuple[str, str], int]:
+    """(squad, jour) -> nombre minimal de membres avec une demi-journée sans téléphone
+
+    Chaque membre reçoit une demi-journée, à tour de rôle, pour ne pas dégarnir
+    toujours la même : la semaine compte alors au moins autant de journées avec
+    une demi-journée sans téléphone que la squad a de membres.
+    """
+    quotas: Dict[Tuple[str, str], int] = Counter()
+    i = 0
+    for team, members in team_index(employees).items():
+        for _ in members:
+            d, _half = HALF_DAYS[i % len(HALF_DAYS)]
+            quotas[team, d] += 1
+            i += 1
+    return quotas
+
+
+def _solve_part(employees: Employees, rules: Dict[str, bool], part: SubProblem,
+                quotas: Dict[Tuple[str, str], int], profile: SolveProfile,
+                control: Optional[SolveControl],
+                previous: Optional[ScheduleResult],
+                encoding: str) -> Tuple[int, Optional[np.ndarray], List[str]]:
+    members = {e: entry for e, entry in employees.items() if entry["team"] in part.squads}
+    sm = build_model(members, rules, horizon=[part.day], squads=list(part.squads),
+                     encoding=encoding)
+    if rules["half_day_no_phone"]:
+        d = part.day
+        for team in part.squads:
+            quota = quotas.get((team, d), 0)
+            if not quota:
+                continue
+            day_off = []
+            for e in sm.teams[team]:
+                half_days = [sm.has_morning_without_phone[e][d]]
+                if d != "Friday":
+                    half_days.append(sm.has_afternoon_without_phone[e][d])
+                off = sm.model.new_bool_var(f"half_day_off_{e}_{d}")
+                sm.model.add_bool_or(half_days).only_enforce_if(off)
+                day_off.append(off)
+            sm.model.add(sum(day_off) >= quota)
+    solver = cp_model.CpSolver()
+    profile.apply(solver)
+    if previous is not None and apply_previous(sm, previous):
+        solver.parameters.repair_hint = True
+    if control is not None:
+        control.attach(solver)
+    status = solver.solve(sm.model)
+    found = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    return status, extract_grid(sm, solver) if found else None, list(sm.employees)
+
+
+def _time_left(profile: SolveProfile, deadline: float) -> SolveProfile:
+    # Le profil, limité au temps qui reste avant l'échéance.
+    return replace(profile, max_time_in_seconds=max(0.0, deadline - time.perf_counter()))
+
+
+def _solve_day(employees: Employees, rules: Dict[str, bool], part: SubProblem,
+               quotas: Dict[Tuple[str, str], int], profile: SolveProfile,
+               control: Optional[SolveControl],
+               previous: Optional[ScheduleResult],
+               encoding: str, deadline: float) -> Tuple[int, Optional[np.ndarray], List[str]]:
+    # Les contraintes ajoutées pour la coordination (équité sur la journée, quotas
+    # de demi-journées sans téléphone) sont relâchées une à une si la journée n'a
+    # pas de solution. Sans elles, il ne reste que les règles du jour : un
+    # INFEASIBLE à la dernière étape vaut pour toute la semaine. Les essais se
+    # partagent le temps de la journée, jusqu'à `deadline`.
+    without_equity = {**rules, "equity": False}
+    attempts = [(rules, quotas), (without_equity, quotas), (without_equity, {})]
+    attempts = [a for i, a in enumerate(attempts) if a not in attempts[:i]]
+    status, grid, members = cp_model.UNKNOWN, None, []
+    for part_rules, part_quotas in attempts:
+        if time.perf_counter() >= deadline:
+            break
+        status, grid, members = _solve_part(employees, part_rules, part, part_quotas,
+                                            _time_left(profile, deadline), control, previous,
+                                            encoding)
+        if grid is not None or (control is not None and control.stopped):
+            break
+    return status, grid, members
+
+
+def _day_profiles(grid: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Pour chaque ligne et chaque journée : nombre de créneaux par rôle (dans
+    # l'ordre de `roles`), et demi-journée sans téléphone possible ou non.
+    counts = np.stack([(grid == ROLE_CODES[r]).sum(axis=2) for r in roles], axis=2)
+    phone = grid == ROLE_CODES["Téléphone"]
+    without_phone = ~phone[:, :, [shifts.index(s) for s in morning_shifts]].any(axis=2)
+    afternoon_free = ~phone[:, :, [shifts.index(s) for s in afternoon_shifts]].any(axis=2)
+    afternoon_free[:, days.index("Friday")] = False
+    return counts, without_phone | afternoon_free
+
+
+def _greedy_assignment(groups: List[List[int]], counts: np.ndarray,
+                       without_phone: np.ndarray) -> Dict[Tuple[int, int], int]:
+    # Jour après jour, chaque journée va au membre dont les totaux restent le plus
+    # proches de la moyenne, les journées les plus atypiques d'abord ; les journées
+    # sans téléphone vont en priorité à ceux qui n'en ont pas encore.
+    given = {}
+    for members in groups:
+        totals = np.zeros((len(members), counts.shape[2]))
+        has_half_day = np.zeros(len(members), dtype=bool)
+        for d_idx in range(len(days)):
+            day_mean = counts[members, d_idx].mean(axis=0)
+            rows = sorted(members, key=lambda i: (not without_phone[i, d_idx],
+                                                  -((counts[i, d_idx] - day_mean) ** 2).sum()))
+            free = list(range(len(members)))
+            for i in rows:
+                mean = totals.mean(axis=0) + day_mean
+                k = min(free, key=lambda k: ((totals[k] + counts[i, d_idx] - mean) ** 2).sum()
+                        - (1000 if without_phone[i, d_idx] and not has_half_day[k] else 0))
+                free.remove(k)
+                totals[k] += counts[i, d_idx]
+                has_half_day[k] |= without_phone[i, d_idx]
+                given[d_idx, i] = members[k]
+    return given
+
+
+def _satisfies(employees: Employees, rules: Dict[str, bool], grid: np.ndarray) -> bool:
+    # Les règles hebdomadaires sur une grille complète.
+    counts, without_phone = _day_profiles(grid)
+    if rules["half_day_no_phone"] and not without_phone.any(axis=1).all():
+        return False
+    if rules["equity"]:
+        names = list(employees)
+        available = open_slots_mask(employees).sum(axis=(1, 2))
+        for team, members in team_index(employees).items():
+            positions = [names.index(e) for e in members]
+            for r in role_dict[team]:
+                totals = counts[positions, :, roles.index(r)].sum(axis=1)
+                if not spread_within(list(totals), list(available[positions]), 2):
+                    return False
+    return True
+
+
+def coordinate(employees: Employees, rules: Dict[str, bool], grid: np.ndarray,
+               profile: SolveProfile, control: Optional[SolveControl] = None) -> Optional[np.ndarray]:
+    """Redistribue les journées entre membres interchangeables pour les règles hebdomadaires
+
+    Une répartition gloutonne suffit souvent ; sinon elle sert de point de départ
+    au petit modèle d'affectation. Renvoie la grille réorganisée, ou None si aucune
+    redistribution ne convient.
+    """
+    names = list(employees)
+    # Interchangeables : même squad, mêmes rôles et mêmes disponibilités.
+    available = open_slots_mask(employees)
+    groups: Dict[Tuple[str, Tuple[str, ...], bytes], List[int]] = {}
+    for i, e in enumerate(names):
+        key = (employees[e]["team"], tuple(sorted(employees[e]["roles"])), available[i].tobytes())
+        groups.setdefault(key, []).append(i)
+    counts, without_phone = _day_profiles(grid)
+    greedy = _greedy_assignment(list(groups.values()), counts, without_phone)
+    coordinated = np.full_like(grid, NO_ROLE)
+    for (d_idx, i), j in greedy.items():
+        coordinated[j, d_idx] = grid[i, d_idx]
+    if _satisfies(employees, rules, coordinated):
+        return coordinated
+
+    model = cp_model.CpModel()
+    # given[d, i, j] : la journée d de la ligne i de la grille est donnée à l'employé j.
+    given: Dict[Tuple[int, int, int], Any] = {}
+    for members in groups.values():
+        for d_idx in range(len(days)):
+            for i in members:
+                for j in members:
+                    given[d_idx, i, j] = model.new_bool_var(f"given_{d_idx}_{i}_{j}")
+                    model.add_hint(given[d_idx, i, j], greedy[d_idx, i] == j)
+            for i in members:
+                model.add_exactly_one(given[d_idx, i, j] for j in members)
+            for j in members:
+                model.add_exactly_one(given[d_idx, i, j] for i in members)
+    group_of = {i: members for members in groups.values() for i in members}
+
+    if rules["half_day_no_phone"]:
+        for j in range(len(names)):
+            model.add(sum(given[d_idx, i, j] for d_idx in range(len(days)) for i in group_of[j]
+                          if without_phone[i, d_idx]) >= 1)
+
+    if rules["equity"]:
+        for team, members in team_index(employees).items():
+            if not members:
+                continue
+            positions = [names.index(e) for e in members]
+            for r in role_dict[team]:
+                role_counts = counts[:, :, roles.index(r)]
+                totals = []
+                for j in positions:
+                    total = model.new_int_var(0, MAX_NB_SHIFTS, f"total_{j}_{r}")
+                    model.add(total == sum(int(role_counts[i, d_idx]) * given[d_idx, i, j]
+                                           for d_idx in range(len(days)) for i in group_of[j]
+                                           if role_counts[i, d_idx]))
+                    totals.append(total)
+                add_spread_limit(model, totals, [int(available[j].sum()) for j in positions], 2,
+                                 f"{team}_{r}")
+
+    solver = cp_model.CpSolver()
+    profile.apply(solver)
+    if control is not None:
+        control.attach(solver)
+    status = solver.solve(model)
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return None
+    coordinated = np.full_like(grid, NO_ROLE)
+    for (d_idx, i, j), literal in given.items():
+        if solver.boolean_value(literal):
+            coordinated[j, d_idx] = grid[i, d_idx]
+    return coordinated
+
+
+def solve_decomposed(employees: Dict[str, Any], rules: Optional[Dict[str, bool]] = None,
+                     profile: Optional[SolveProfile] = None,
+                     on_solution: Optional[Callable[[ScheduleResult], None]] = None,
+                     control: Optional[SolveControl] = None,
+                     previous: Optional[ScheduleResult] = None,
+                     encoding: str = "linear") -> ScheduleResult:
+    """Résout le planning jour par jour en parallèle, puis coordonne la semaine
+
+    Le budget de temps du profil vaut pour l'ensemble : les journées en ont au plus
+    `DAYS_SHARE`, partagé entre les vagues de sous-problèmes, et chaque étape
+    suivante ce qui reste. Les cœurs sont partagés entre les sous-problèmes
+    résolus en même temps.
+    """
+    start = time.perf_counter()
+    employees = normalize_employees(employees)
+    rules = normalize_rules(rules)
+    profile = get_profile(profile)
+    deadline = start + profile.max_time_in_seconds
+    parts = split(employees, rules)
+    quotas = no_phone_quotas(employees) if rules["half_day_no_phone"] else {}
+    threads = max(1, min(len(parts), os.cpu_count() or 1))
+    part_profile = replace(profile, num_workers=max(1, profile.num_workers // threads))
+    # Les sous-problèmes passent par vagues de `threads` : au lancement, chacun reçoit
+    # sa part du temps qui reste aux journées, y compris celui laissé par les précédents.
+    days_deadline = start + profile.max_time_in_seconds * DAYS_SHARE
+    lock = threading.Lock()
+    waiting = [len(parts)]
+
+    def solve_day(part: SubProblem) -> Tuple[int, Optional[np.ndarray], List[str]]:
+        with lock:
+            waves = math.ceil(waiting[0] / threads)
+            waiting[0] -= 1
+        now = time.perf_counter()
+        part_deadline = now + max(0.0, days_deadline - now) / waves
+        return _solve_day(employees, rules, part, quotas, part_profile, control, previous,
+                          encoding, part_deadline)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        solved = list(pool.map(solve_day, parts))
+    if any(status == cp_model.INFEASIBLE for status, _, _ in solved):
+        return ScheduleResult(status=cp_model.INFEASIBLE, status_name="INFEASIBLE",
+                              wall_time=time.perf_counter() - start, profile=profile.name,
+                              employees=tuple(employees), open_mask=open_slots_mask(employees))
+
+    names = list(employees)
+    grid = None
+    if all(part_grid is not None for _, part_grid, _ in solved):
+        grid = np.full((len(names), len(days), len(shifts)), NO_ROLE, dtype=np.int8)
+        for part, (_, part_grid, members) in zip(parts, solved):
+            d_idx = days.index(part.day)
+            grid[[names.index(e) for e in members], d_idx] = part_grid[:, d_idx]
+    coordinated = grid
+    if grid is not None and (rules["half_day_no_phone"] or rules["equity"]):
+        coordinated = coordinate(employees, rules, grid, _time_left(profile, deadline), control)
+
+    if coordinated is not None:
+        coordinated.setflags(write=False)
+        result = ScheduleResult(status=cp_model.OPTIMAL, status_name="OPTIMAL",
+                                wall_time=time.perf_counter() - start, profile=profile.name,
+                                employees=tuple(names), grid=coordinated,
+                                open_mask=open_slots_mask(employees))
+        if previous is not None:
+            result = replace(result, reused_employees=len(set(names) & set(previous.employees)),
+                             changed_cells=changed_cells(result, previous))
+        if on_solution is not None:
+            on_solution(result)
+        return result
+
+    # Le découpage n'a pas abouti : modèle complet, en partant des journées trouvées.
+    start_from = previous
+    if grid is not None:
+        grid.setflags(write=False)
+        start_from = ScheduleResult(status=cp_model.FEASIBLE, status_name="FEASIBLE", wall_time=0.0,
+                                    profile=profile.name, employees=tuple(names), grid=grid,
+                                    open_mask=open_slots_mask(employees))
+    if time.perf_counter() >= deadline:
+        return ScheduleResult(status=cp_model.UNKNOWN, status_name="UNKNOWN",
+                              wall_time=time.perf_counter() - start, profile=profile.name,
+                              employees=tuple(names), open_mask=open_slots_mask(employees))
+    result = _solve(employees, rules, _time_left(profile, deadline), on_solution, control,
+                    start_from, encoding=encoding)
+    if start_from is not previous:
+        result = replace(result, reused_employees=0, changed_cells=None)
+        if previous is not None and result.found:
+            result = replace(result, changed_cells=changed_cells(result, previous))
+    return replace(result, wall_time=time.perf_counter() - start)
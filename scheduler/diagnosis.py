@@ -0,0 +1,209 @@
+"""Diagnostic d'un planning impossible : quelles règles sont en conflit ?
+
+Deux niveaux :
+- un pré-contrôle de capacité (demande au téléphone, sur Intercom et sur
+  Slack/tâches face aux personnes disponibles), sans solveur et mis en cache ;
+  `solve` s'en sert pour répondre INFEASIBLE sans lancer CP-SAT ;
+- `diagnose`, qui active les contraintes de chaque règle par un littéral posé en
+  hypothèse : quand le modèle est impossible, CP-SAT renvoie un sous-ensemble
+  d'hypothèses suffisant pour l'impossibilité, qu'on réduit ensuite règle par règle.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+from .availability import availability_mask
+from .config import RULES, afternoon_shifts, days, intercom_roles, morning_shifts, normalize_rules, shifts
+from .engine import SLACK_PER_HALF_DAY, SolveControl, build_model, phone_demand
+from .profiles import SolveProfile, get_profile
+from .roster import normalize_employees, team_index
+
+
+@dataclass(frozen=True)
+class Conflict:
+    """Des règles qui ne peuvent pas être respectées ensemble, et pourquoi"""
+    rules: Tuple[str, ...]
+    reason: str
+
+    def describe(self) -> str:
+        return f"{' + '.join(RULES[rule] for rule in self.rules)} — {self.reason}"
+
+
+@dataclass(frozen=True)
+class Diagnosis:
+    """Le résultat d'un diagnostic"""
+    status_name: str
+    conflicts: Tuple[Conflict, ...]
+    wall_time: float
+    # Chaque règle du conflit trouvé par le solveur a été retirée sans le lever.
+    minimal: bool = False
+
+    @property
+    def infeasible(self) -> bool:
+        return self.status_name == "INFEASIBLE"
+
+
+def _slot_ranges(slots: List[str]) -> str:
+    """Créneaux consécutifs regroupés : 09:00-11:30, 14:00"""
+    ranges: List[List[str]] = []
+    for s in slots:
+        if ranges and shifts.index(s) == shifts.index(ranges[-1][-1]) + 1:
+            ranges[-1].append(s)
+        else:
+            ranges.append([s])
+    return ", ".join(r[0] if len(r) == 1 else f"{r[0]}-{r[-1]}" for r in ranges)
+
+
+def _capacity_conflicts(employees: Dict[str, Any], rules: Dict[str, bool]) -> Tuple[Conflict, ...]:
+    names = list(employees)
+    mask = availability_mask(employees)
+    can = {r: np.array([r in employees[e]["roles"] for e in names], dtype=bool)
+           for r in ["Téléphone", "Slack/tâches", *intercom_roles.values()]}
+    members = {team: np.array([names.index(e) for e in team_members], dtype=np.int64)
+               for team, team_members in team_index(employees).items()}
+    # (règles, jour, raison) -> créneaux concernés
+    slots: Dict[Tuple[Tuple[str, ...], str, str], List[str]] = {}
+    conflicts = []
+    for d_idx, d in enumerate(days):
+        for s_idx, s in enumerate(shifts):
+            present = mask[:, d_idx, s_idx]
+            if not present.any():
+                continue
+            found = []
+            demand = phone_demand(d, s) if rules["phone_coverage"] else None
+            if demand:
+                phones = int((present & can["Téléphone"]).sum())
+                if phones < demand:
+                    found.append((("phone_coverage",),
+                                  f"{demand} personnes au téléphone demandées, {phones} disponibles"))
+            capable = present & can["Téléphone"] if demand else np.zeros(len(names), dtype=bool)
+            intercom = 0
+            if rules["intercom_coverage"]:
+                for team, role in intercom_roles.items():
+                    idx = members[team]
+                    if not present[idx].any():
+                        continue
+                    intercom += 1
+                    capable[idx] |= present[idx] & can[role][idx]
+                    if not (present[idx] & can[role][idx]).any():
+                        found.append((("intercom_coverage",),
+                                      f"aucun membre de la squad {team} disponible pour {role}"))
+            # Une personne ne tient qu'un rôle à la fois.
+            if not found and demand and intercom and capable.sum() < demand + intercom:
+                found.append((("phone_coverage", "intercom_coverage"),
+                              f"{demand + intercom} personnes demandées au téléphone et sur "
+                              f"Intercom, {int(capable.sum())} disponibles"))
+            for rule_set, reason in found:
+                slots.setdefault((rule_set, d, reason), []).append(s)
+    for (rule_set, d, reason), conflict_slots in slots.items():
+        conflicts.append(Conflict(rule_set, f"{d} {_slot_ranges(conflict_slots)} : {reason}"))
+
+    if rules["slack_each"]:
+        for e_idx, e in enumerate(names):
+            if mask[e_idx].any() and not can["Slack/tâches"][e_idx]:
+                conflicts.append(Conflict(("slack_each",), f"{e} n'a pas le rôle Slack/tâches"))
+    if rules["slack_half_day"]:
+        rule_set = ("slack_half_day", "slack_max") if rules["slack_max"] else ("slack_half_day",)
+        for team, idx in members.items():
+            for d_idx, d in enumerate(days):
+                for label, half_day_shifts in (("matin", morning_shifts), ("après-midi", afternoon_shifts)):
+                    half = [shifts.index(s) for s in half_day_shifts]
+                    team_mask = mask[idx][:, d_idx, half]
+                    if not team_mask.any():
+                        continue
+                    slack = team_mask & can["Slack/tâches"][idx, None]
+                    # Au plus une personne sur Slack/tâches par créneau avec "slack_max".
+                    capacity = int(slack.any(axis=0).sum() if rules["slack_max"] else slack.sum())
+                    if capacity < SLACK_PER_HALF_DAY:
+                        conflicts.append(Conflict(rule_set, f"{d} {label} : {capacity} créneau(x) "
+                                                            f"Slack/tâches possibles pour la squad "
+                                                            f"{team}, {SLACK_PER_HALF_DAY} demandés"))
+    return tuple(conflicts)
+
+
+# Pré-contrôles déjà faits, par équipe et règles.
+PRECHECK_CACHE_SIZE = 64
+_prechecks: "OrderedDict[str, Tuple[Conflict, ...]]" = OrderedDict()
+_prechecks_lock = threading.Lock()
+
+
+def precheck(employees: Dict[str, Any], rules: Optional[Dict[str, bool]] = None) -> Tuple[Conflict, ...]:
+    """Conflits de capacité évidents, trouvés sans solveur (aucun : rien n'est prouvé)
+
+    Chaque conflit suffit à rendre le planning impossible.
+    """
+    employees = normalize_employees(employees)
+    rules = normalize_rules(rules)
+    payload = json.dumps({"employees": employees, "rules": rules}, sort_keys=True, ensure_ascii=False)
+    key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    with _prechecks_lock:
+        if key in _prechecks:
+            _prechecks.move_to_end(key)
+            return _prechecks[key]
+    conflicts = _capacity_conflicts(employees, rules)
+    with _prechecks_lock:
+        _prechecks[key] = conflicts
+        while len(_prechecks) > PRECHECK_CACHE_SIZE:
+            _prechecks.popitem(last=False)
+    return conflicts
+
+
+def diagnose(employees: Dict[str, Any], rules: Optional[Dict[str, bool]] = None,
+             profile: Optional[Union[str, SolveProfile]] = None,
+             control: Optional[SolveControl] = None) -> Diagnosis:
+    """Cherche des règles qui, ensemble, rendent le planning impossible
+
+    Le pré-contrôle répond d'abord s'il le peut. Sinon, une seule résolution du
+    modèle avec une hypothèse par règle donne un conflit, qu'on réduit en
+    retirant ses règles une à une, dans le temps imparti par le profil.
+    `control` permet de l'interrompre depuis un autre thread : le conflit trouvé
+    jusque-là est renvoyé, sans être réduit davantage.
+    """
+    start = time.perf_counter()
+    profile = get_profile(profile)
+    rules = normalize_rules(rules)
+    conflicts = precheck(employees, rules)
+    if conflicts:
+        return Diagnosis("INFEASIBLE", conflicts, time.perf_counter() - start)
+    sm = build_model(employees, rules, guarded=True)
+    rule_of = {literal.index: rule for rule, literal in sm.guards.items()}
+    solver = cp_model.CpSolver()
+    profile.apply(solver)
+    if control is not None:
+        control.attach(solver)
+    status = solver.solve(sm.model)
+    if status != cp_model.INFEASIBLE:
+        return Diagnosis(solver.status_name(status), (), time.perf_counter() - start)
+    core = [rule_of[i] for i in solver.sufficient_assumptions_for_infeasibility()]
+    # Règles sans lesquelles le reste du conflit est réalisable.
+    necessary = set()
+    for rule in [r for r in RULES if r in core]:
+        if rule not in core:
+            continue
+        if len(core) == 1:
+            # Sans aucune règle, le planning vide convient.
+            necessary.add(rule)
+            break
+        remaining = profile.max_time_in_seconds - (time.perf_counter() - start)
+        if remaining <= 0 or (control is not None and control.stopped):
+            break
+        sm.model.clear_assumptions()
+        sm.model.add_assumptions([sm.guards[r] for r in core if r != rule])
+        solver.parameters.max_time_in_seconds = remaining
+        status = solver.solve(sm.model)
+        if status == cp_model.INFEASIBLE:
+            # Impossible même sans cette règle : un conflit plus petit s'en passe.
+            core = [rule_of[i] for i in solver.sufficient_assumptions_for_infeasibility()]
+        elif status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            necessary.add(rule)
+    conflict = Conflict(tuple(r for r in RULES if r in core),
+                        "ces règles ne peuvent pas être respectées ensemble")
+    return Diagnosis("INFEASIBLE", (conflict,), time.perf_counter() - start,
+                     minimal=set(core) <= necessary)
@@ -0,0 +1,1307 @@
+"""Construction et résolution du modèle CP-SAT du planning."""
+import hashlib
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Collection, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from ortools.sat.python import cp_model, cp_model_helper
+
+from .availability import availability_mask, employee_availability
+from .config import (NO_ROLE, ROLE_CODES, RULES, afternoon_shifts, days,
+                     get_shifts_for_day, intercom_roles, morning_shifts,
+                     normalize_rules, normalize_soft, role_dict, roles, shifts)
+from .history import EARLY_PHONE, EARLY_PHONE_SHIFT, History, carried_counts, record_week
+from .profiles import SolveProfile, get_profile
+from .profiling import (BlockStats, BuildProfiler, SolverStats, block_context,
+                        enable_solve_log, solver_stats)
+from .roster import Employees, normalize_employees, team_index
+
+if TYPE_CHECKING:
+    from .diagnosis import Conflict
+    from .store import ScheduleStore
+
+# employé -> jour -> créneau -> rôle (None si aucun rôle)
+Assignments = Dict[str, Dict[str, Dict[str, Optional[str]]]]
+
+
+def open_slots_mask(employees: Employees) -> np.ndarray:
+    """Masque (employé x jour x créneau) des créneaux travaillés, disponibilités comprises"""
+    return availability_mask(normalize_employees(employees))
+
+
+@dataclass
+class ScheduleModel:
+    """Le modèle CP-SAT et les variables de décision associées"""
+    model: cp_model.CpModel
+    employees: Employees
+    rules: Dict[str, bool]
+    # équipe -> membres, utilisé par toutes les règles propres à une équipe
+    teams: Dict[str, List[str]]
+    # employé -> rôle -> jour -> créneau -> variable booléenne, uniquement pour les
+    # rôles attribués à l'employé et les créneaux travaillés du jour.
+    schedule: Dict[str, Dict[str, Dict[str, Dict[str, Any]]]]
+    has_morning_without_phone: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    has_afternoon_without_phone: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # employé -> masque (jour x créneau) des créneaux où il travaille, compilé une
+    # fois à partir des horaires et de ses disponibilités (voir availability.py)
+    available: Dict[str, np.ndarray] = field(default_factory=dict)
+    # Le même masque en listes : employé -> jour -> créneaux travaillés
+    working: Dict[str, Dict[str, List[str]]] = field(default_factory=dict)
+    # employé -> rôle -> nombre de créneaux sur les jours modélisés (règle "equity")
+    role_totals: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # Mesures par bloc de contraintes, si la construction a été instrumentée
+    build_report: Optional[List[BlockStats]] = None
+    # Jours modélisés : toute la semaine, sauf pour les sous-problèmes de la
+    # résolution décomposée (voir decompose.py).
+    horizon: List[str] = field(default_factory=lambda: list(days))
+    # Termes de l'objectif (à minimiser), ajoutés par les différentes options
+    objective_terms: List[Any] = field(default_factory=list)
+    encoding: str = "linear"
+    # Règles souples : règle -> poids. Leurs contraintes peuvent être enfreintes ;
+    # chaque violation (indice de la contrainte -> règle, 1 si enfreinte) est pénalisée.
+    soft: Dict[str, int] = field(default_factory=dict)
+    penalties: Dict[int, Tuple[str, Any]] = field(default_factory=dict)
+    # Diagnostic : règle -> littéral qui active ses contraintes, posé en hypothèse
+    # (voir diagnosis.py)
+    guards: Dict[str, Any] = field(default_factory=dict)
+    # Contraintes de chaque employé et de chaque bloc qui porte sur toute une squad
+    # (intervalles d'indices dans le modèle), pour mettre le modèle à jour quand
+    # l'équipe change (voir update_model).
+    employee_constraints: Dict[str, List[Tuple[int, int]]] = field(default_factory=dict)
+    shared_constraints: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    cleared_constraints: int = 0
+
+    # Index à plat des variables de décision, pour lire une solution d'un seul coup :
+    # indice de la variable dans le modèle, case de la grille, code du rôle.
+    literals: List[Any] = field(default_factory=list)
+    var_index: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    cell_index: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    role_code: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int8))
+    # Même index, par employé (positions dans la grille de l'employé)
+    employee_index: Dict[str, Tuple[List[Any], np.ndarray, np.ndarray, np.ndarray]] = field(
+        default_factory=dict)
+
+    def var(self, e: str, r: str, d: str, s: str) -> Any:
+        """La variable (employé, rôle, jour, créneau), ou 0 si cette affectation est impossible"""
+        return self.schedule[e].get(r, {}).get(d, {}).get(s, 0)
+
+    def set_availability(self, e: str) -> None:
+        """Compile les disponibilités de l'employé (masque et listes de créneaux)"""
+        self.available[e] = employee_availability(self.employees[e])
+        self.working[e] = {d: [s for s, working in zip(shifts, row) if working]
+                           for d, row in zip(days, self.available[e])}
+
+    def working_shifts(self, e: str, d: str) -> List[str]:
+        """Les créneaux du jour où l'employé travaille"""
+        return self.working[e][d]
+
+    def open_shifts(self, d: str, members: Optional[List[str]] = None) -> List[str]:
+        """Les créneaux du jour où au moins un des `members` (par défaut tout le monde) travaille
+
+        Un créneau où personne n'est disponible (jour férié) est fermé : les règles
+        de couverture ne s'y appliquent pas.
+        """
+        d_idx = days.index(d)
+        members = self.employees if members is None else members
+        row = np.zeros(len(shifts), dtype=bool)
+        for e in members:
+            row |= self.available[e][d_idx]
+        return [s for s, is_open in zip(shifts, row) if is_open]
+
+    def available_count(self, e: str) -> int:
+        """Nombre de créneaux travaillés par l'employé sur les jours modélisés"""
+        return int(sum(self.available[e][days.index(d)].sum() for d in self.horizon))
+
+    def add_rule(self, rule: str, constraint: Any) -> Any:
+        """Ajoute une contrainte propre à une règle (voir `rule_constraint`)"""
+        return self.rule_constraint(rule, self.model.add(constraint))
+
+    def rule_constraint(self, rule: str, constraint: Any) -> Any:
+        """Rattache une contrainte à sa règle : hypothèse de diagnostic, puis règle souple
+
+        Une règle souple n'est imposée que si un littéral "respectée" est vrai ;
+        chaque contrainte enfreinte coûte le poids de sa règle.
+        """
+        if rule in self.guards:
+            constraint.only_enforce_if(self.guards[rule])
+        if rule not in self.soft:
+            return constraint
+        kept = self.model.new_bool_var(f"kept_{rule}_{constraint.index}")
+        constraint.only_enforce_if(kept)
+        self.penalties[constraint.index] = (rule, 1 - kept)
+        return constraint
+
+    def update_objective(self) -> None:
+        """L'objectif : violations pondérées des règles souples, puis termes ajoutés"""
+        penalty = sum(self.soft[rule] * term for rule, term in self.penalties.values())
+        if self.penalties or self.objective_terms:
+            self.model.minimize(penalty + sum(self.objective_terms))
+
+    def add_objective(self, term: Any) -> None:
+        """Ajoute un terme à minimiser ; l'objectif du modèle est la somme des termes"""
+        self.objective_terms.append(term)
+        self.update_objective()
+
+    def index_variables(self) -> None:
+        """Construit l'index à plat des variables de décision
+
+        L'index de chaque employé est gardé : après une mise à jour du modèle,
+        seuls les nouveaux employés sont indexés.
+        """
+        day_pos = {d: i for i, d in enumerate(days)}
+        shift_pos = {s: i for i, s in enumerate(shifts)}
+        for e in self.employees:
+            if e in self.employee_index:
+                continue
+            literals, var_index, cell_index, role_code = [], [], [], []
+            for r, role_schedule in self.schedule[e].items():
+                for d, day_schedule in role_schedule.items():
+                    for s, literal in day_schedule.items():
+                        literals.append(literal)
+                        var_index.append(literal.index)
+                        cell_index.append(day_pos[d] * len(shifts) + shift_pos[s])
+                        role_code.append(ROLE_CODES[r])
+            self.employee_index[e] = (literals, np.array(var_index, dtype=np.int64),
+                                      np.array(cell_index, dtype=np.int64),
+                                      np.array(role_code, dtype=np.int8))
+        parts = [self.employee_index[e] for e in self.employees]
+        cells_per_employee = len(days) * len(shifts)
+        self.literals = [literal for part in parts for literal in part[0]]
+        self.var_index = np.concatenate([np.zeros(0, dtype=np.int64)] + [part[1] for part in parts])
+        self.cell_index = np.concatenate([np.zeros(0, dtype=np.int64)] +
+                                         [part[2] + e_idx * cells_per_employee
+                                          for e_idx, part in enumerate(parts)])
+        self.role_code = np.concatenate([np.zeros(0, dtype=np.int8)] + [part[3] for part in parts])
+
+
+@dataclass(frozen=True)
+class ScheduleResult:
+    """Le résultat d'une résolution
+
+    `grid` contient, pour chaque (employé, jour, créneau), le code du rôle tenu
+    (voir `config.ROLE_CODES`, `NO_ROLE` si aucun) ; `open_mask` indique les
+    créneaux travaillés. Les deux sont dans l'ordre de `employees`, `days`, `shifts`.
+    """
+    status: int
+    status_name: str
+    wall_time: float
+    profile: str
+    employees: Tuple[str, ...] = ()
+    grid: Optional[np.ndarray] = None
+    open_mask: Optional[np.ndarray] = None
+    # Repartir d'un planning précédent : mode utilisé, nombre d'employés repris
+    # et nombre de créneaux modifiés pour eux.
+    stability: str = "hint"
+    reused_employees: int = 0
+    changed_cells: Optional[int] = None
+    # Mode instrumenté : mesures de construction par bloc et statistiques du solveur
+    build_report: Optional[List[BlockStats]] = None
+    solver_stats: Optional[SolverStats] = None
+    # Règles souples : nombre de contraintes enfreintes pour chaque règle
+    violations: Optional[Dict[str, int]] = None
+    # Conflits trouvés par le pré-contrôle de capacité : le solveur n'a pas été lancé
+    conflicts: Optional[Tuple["Conflict", ...]] = None
+    # Bris de symétrie : nombre d'employés interchangeables ordonnés
+    symmetric_employees: int = 0
+
+    @property
+    def found(self) -> bool:
+        return self.status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+
+    @property
+    def optimal(self) -> bool:
+        return self.status == cp_model.OPTIMAL
+
+    @property
+    def assignments(self) -> Optional[Assignments]:
+        """La solution sous forme de dictionnaires employé -> jour -> créneau -> rôle"""
+        if self.grid is None:
+            return None
+        names = np.array([None] + list(roles), dtype=object)[self.grid]
+        return {e: {d: dict(zip(shifts, names[e_idx, d_idx]))
+                    for d_idx, d in enumerate(days)}
+                for e_idx, e in enumerate(self.employees)}
+
+    def fingerprint(self) -> str:
+        """Empreinte de la solution (employés et grille)"""
+        digest = hashlib.sha256("\n".join(self.employees).encode("utf-8"))
+        if self.grid is not None:
+            digest.update(np.ascontiguousarray(self.grid).tobytes())
+        return digest.hexdigest()
+
+
+def canonical_employees(employees: Dict[str, Any]) -> Employees:
+    """Forme canonique de la liste des employés (ordre des noms et des rôles indifférent)"""
+    employees = normalize_employees(employees)
+    return {e: {**employees[e], "roles": sorted(employees[e]["roles"])} for e in sorted(employees)}
+
+
+def rules_key(rules: Optional[Dict[str, bool]] = None) -> str:
+    """Empreinte d'une configuration de règles"""
+    return json.dumps(normalize_rules(rules), sort_keys=True)
+
+
+def request_key(employees: Dict[str, Any], rules: Optional[Dict[str, bool]] = None,
+                profile: Optional[Union[str, SolveProfile]] = None,
+                stability: str = "hint", previous: Optional["ScheduleResult"] = None,
+                instrument: bool = False, decompose: bool = False,
+                encoding: str = "linear", history: Optional[History] = None,
+                soft: Optional[Dict[str, int]] = None, symmetry: bool = False) -> str:
+    """Empreinte d'une demande de planning : mêmes employés, règles et profil => même clé
+
+    En mode "hint" le planning précédent n'est qu'un point de départ et ne change
+    pas le problème ; dans les autres modes il fait partie de la demande.
+    """
+    request = {"employees": canonical_employees(employees),
+               "rules": normalize_rules(rules),
+               "profile": get_profile(profile).search_key()}
+    if stability != "hint" and previous is not None and previous.found:
+        request["stability"] = stability
+        request["previous"] = previous.fingerprint()
+    if instrument:
+        request["instrument"] = True
+    if decompose:
+        request["decompose"] = True
+    if encoding != "linear":
+        request["encoding"] = encoding
+    if history is not None:
+        # Seuls les compteurs reportés sur l'équipe actuelle comptent.
+        request["history"] = carried_counts(history, employees)
+    if soft:
+        request["soft"] = soft
+    if symmetry:
+        request["symmetry"] = True
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Les contraintes !
+
+def _add_base_constraints(sm: ScheduleModel) -> None:
+    # Les heures non travaillées et les rôles non attribués n'ont pas de variable
+    # (voir build_model) : il reste à interdire deux rôles en même temps.
+    for e in sm.employees:
+        for d in sm.horizon:
+            for s in sm.working_shifts(e, d):
+                literals = [sm.schedule[e][r][d][s] for r in sm.schedule[e]]
+                if len(literals) > 1:
+                    sm.model.add_at_most_one(literals)
+
+
+def phone_demand(d: str, s: str) -> Optional[int]:
+    """Nombre de personnes au téléphone demandé sur un créneau (None : pas d'exigence)"""
+    # Il doit toujours y avoir 4 personnes (les 2 squads confondues)
+    # au téléphone entre 9h et 12h et entre 14h et 18h
+    # (sauf le mercredi et le vendredi : jusqu'à 17h)
+    # Le vendredi : 5 personnes au téléphone
+    if s in ['09:00', '09:30', '10:00', '10:30', '11:00', '11:30']:
+        return 4
+    if s in ['14:00', '14:30', '15:00', '15:30', '16:00', '16:30', '17:00', '17:30']:
+        return 5 if d == "Friday" and s in ['15:30', '16:00', '16:30', '17:00', '17:30'] else 4
+    if s in ['13:30', '08:30']:
+        return 0
+    return None
+
+
+def _add_phone_coverage(sm: ScheduleModel) -> None:
+    var, employees = sm.var, sm.employees
+    for d in sm.horizon:
+        for s in sm.open_shifts(d):
+            demand = phone_demand(d, s)
+            if demand is not None:
+                sm.add_rule("phone_coverage", sum(var(e, "Téléphone", d, s)
+                                              for e in employees) == demand)
+
+
+def _add_intercom_coverage(sm: ScheduleModel) -> None:
+    # Dans chaque squad, il doit toujours y avoir quelqu'un sur Intercom
+    var = sm.var
+    for d in sm.horizon:
+        for team, members in sm.teams.items():
+            if team in intercom_roles:
+                for s in sm.open_shifts(d, members):
+                    sm.add_rule("intercom_coverage", sum(var(e, intercom_roles[team], d, s)
+                                                     for e in members) == 1)
+
+
+def _add_slack_max(sm: ScheduleModel) -> None:
+    # Pour chaque squad, il doit toujours y avoir maximum 1 personne sur Slack/tâches.
+    var = sm.var
+    for d in sm.horizon:
+        for members in sm.teams.values():
+            for s in sm.open_shifts(d, members):
+                sm.add_rule("slack_max", sum(var(e, "Slack/tâches", d, s)
+                                             for e in members) <= 1)
+
+
+def _add_slack_each(sm: ScheduleModel) -> None:
+    # Pour chaque squad, chaque personne doit avoir au moins 1 créneau Slack/tâches
+    var, employees = sm.var, sm.employees
+    for e in employees:
+        for d in sm.horizon:
+            # (les jours où la personne travaille)
+            if sm.working_shifts(e, d):
+                sm.add_rule("slack_each",
+                            sum(var(e, "Slack/tâches", d, s) for s in sm.working_shifts(e, d)) > 0)
+
+
+def _add_half_day_no_phone(sm: ScheduleModel) -> None:
+    # Chaque personne doit avoir une demi-journée sans téléphone par semaine.
+    # Cette demi-journée ne peut pas être le vendredi après-midi.
+    model, var, employees = sm.model, sm.var, sm.employees
+    for e in employees:
+        # Une variable booléenne pour indiquer si une demi-journée sans téléphone est respectée
+        sm.has_morning_without_phone[e] = {
+            d: model.new_bool_var(f"morning_without_phone_{e}_{d}") for d in sm.horizon
+        }
+        sm.has_afternoon_without_phone[e] = {
+            d: model.new_bool_var(f"afternoon_without_phone_{e}_{d}") for d in sm.horizon
+        }
+        for d in sm.horizon:
+            # Contraintes pour le matin : aucune plage horaire avec téléphone
+            morning_phone = sum(var(e, "Téléphone", d, s)
+                                for s in sm.working_shifts(e, d) if s in morning_shifts)
+            model.add(morning_phone == 0).only_enforce_if(
+                sm.has_morning_without_phone[e][d])
+            model.add(morning_phone >= 1).only_enforce_if(
+                ~sm.has_morning_without_phone[e][d])
+
+            # Contraintes pour l'après-midi : aucune plage horaire avec téléphone, sauf vendredi
+            if d != "Friday":
+                afternoon_phone = sum(var(e, "Téléphone", d, s)
+                                      for s in sm.working_shifts(e, d) if s in afternoon_shifts)
+                model.add(afternoon_phone == 0).only_enforce_if(
+                    sm.has_afternoon_without_phone[e][d])
+                model.add(afternoon_phone >= 1).only_enforce_if(
+                    ~sm.has_afternoon_without_phone[e][d])
+
+        # La contrainte principale : chaque personne doit avoir au moins une demi-journée sans téléphone
+        # (sur une partie de la semaine seulement, c'est la coordination qui s'en charge).
+        if sm.horizon == days:
+            sm.add_rule(
+                "half_day_no_phone",
+                sum(sm.has_morning_without_phone[e][d] for d in days) +
+                sum(sm.has_afternoon_without_phone[e][d]
+                    for d in days if d != "Friday") >= 1
+            )
+
+
+# Créneaux Slack/tâches demandés à chaque squad par demi-journée
+SLACK_PER_HALF_DAY = 4
+
+
+def _add_slack_half_day(sm: ScheduleModel) -> None:
+    # Pour chaque squad, il doit y avoir au moins 2 créneaux Slack/tâches par demi-journée.
+    var = sm.var
+    for d in sm.horizon:
+        for members in sm.teams.values():
+            open_shifts = sm.open_shifts(d, members)
+            for half_day_shifts in [morning_shifts, afternoon_shifts]:
+                # (sauf si toute la squad est absente pour la demi-journée)
+                if not set(half_day_shifts) & set(open_shifts):
+                    continue
+                sm.add_rule("slack_half_day", sum(
+                    var(e, "Slack/tâches", d, s)
+                    for e in members
+                    for s in half_day_shifts
+                ) >= SLACK_PER_HALF_DAY)
+
+
+MAX_NB_SHIFTS = 100
+
+
+def add_spread_limit(model: cp_model.CpModel, totals: List[Any], available: List[int],
+                     max_spread: int, name: str) -> Any:
+    """Limite l'écart entre des totaux, rapportés au temps de présence de chacun
+
+    Chaque total est ramené à un temps plein (le plus grand de `available`) ; avec
+    les mêmes disponibilités pour tous, c'est max - min <= max_spread. Les personnes
+    absentes sur toute la période ne comptent pas. Renvoie la contrainte sur l'écart.
+    """
+    full = max(available, default=0)
+    min_shifts = model.new_int_var(0, MAX_NB_SHIFTS, f"min_shifts_{name}")
+    max_shifts = model.new_int_var(0, MAX_NB_SHIFTS, f"max_shifts_{name}")
+    for total, count in zip(totals, available):
+        if count:
+            model.add(count * min_shifts <= full * total)
+            model.add(full * total <= count * max_shifts)
+    return model.add(max_shifts - min_shifts <= max_spread)
+
+
+def spread_within(totals: List[int], available: List[int], max_spread: int) -> bool:
+    """Vérifie sur une solution la limite posée par add_spread_limit"""
+    full = max(available, default=0)
+    pairs = [(int(total), int(count)) for total, count in zip(totals, available) if count]
+    if not pairs:
+        return True
+    lowest = min(total * full // count for total, count in pairs)
+    return all(total * full <= (lowest + max_spread) * count for total, count in pairs)
+
+
+def _add_equity_totals(sm: ScheduleModel) -> None:
+    # Temps passé par chaque personne sur chacun des rôles de sa squad (sur les jours modélisés).
+    model, var = sm.model, sm.var
+    for e in sm.employees:
+        team = sm.employees[e]["team"]
+        if team not in sm.teams:
+            continue
+        sm.role_totals[e] = {}
+        for r in role_dict[team]:
+            total = model.new_int_var(0, MAX_NB_SHIFTS, f"total_shifts_c_{e}_{r}")
+            model.add(total == sum(var(e, r, d, s)
+                                   for d in sm.horizon for s in sm.working_shifts(e, d)))
+            sm.role_totals[e][r] = total
+
+
+def _add_equity(sm: ScheduleModel) -> None:
+    # Dans chaque squad, chaque personne doit passer à peu près le même temps sur chaque rôle
+    # (sur les jours modélisés), au prorata de son temps de présence pour les temps
+    # partiels et les absents. Les totaux par personne viennent de _add_equity_totals.
+    for team, team_employees in sm.teams.items():
+        if not team_employees:
+            continue
+        available = [sm.available_count(e) for e in team_employees]
+        for r in role_dict[team]:
+            # Sur une seule journée (résolution décomposée), un écart de 1 laisse à la
+            # coordination de quoi équilibrer la semaine.
+            sm.rule_constraint("equity", add_spread_limit(sm.model,
+                                                          [sm.role_totals[e][r] for e in team_employees],
+                                                          available, 2 if sm.horizon == days else 1,
+                                                          f"{team}_{r}"))
+
+
+def _add_consecutive(sm: ScheduleModel) -> None:
+    # Pas + de 3 créneaux à la suite pour chaque rôle sauf Téléphone, maximum 4 créneaux.
+    var, employees = sm.var, sm.employees
+    for e in employees:
+        for d in sm.horizon:
+            # Seuls les rôles attribués à l'employé ont des variables.
+            for r in sm.schedule[e]:
+                if r == "Téléphone":
+                    continue
+                for s_idx in range(min(4, len(morning_shifts))):
+                    sm.add_rule(
+                        "consecutive",
+                        sum(var(e, r, d, s)
+                            for s in morning_shifts[s_idx:s_idx+4]) <= 2
+                    )
+                for s_idx in range(min(5, len(afternoon_shifts))):
+                    sm.add_rule(
+                        "consecutive",
+                        sum(var(e, r, d, s)
+                            for s in afternoon_shifts[s_idx:s_idx+5]) <= 4
+                    )
+
+
+def phone_blocks_of_day(d: str) -> Tuple[List[str], List[str], List[str], List[str]]:
+    """Les créneaux de téléphone d'une journée : 1h30 tôt / tard le matin, puis l'après-midi"""
+    early_morning_shifts = ["09:00", "09:30", "10:00"]
+    late_morning_shifts = ["10:30", "11:00", "11:30"]
+    if d in ["Monday", "Tuesday", "Thursday"]:
+        return (early_morning_shifts, late_morning_shifts,
+                ["14:00", "14:30", "15:00", "15:30"], ["16:00", "16:30", "17:00", "17:30"])
+    return (early_morning_shifts, late_morning_shifts,
+            ["14:00", "14:30", "15:00"], ["15:30", "16:00", "16:30"])
+
+
+def _add_phone_blocks(sm: ScheduleModel) -> None:
+    # Organisation du téléphone en 'créneaux' de 1h30 le matin / 2h l'après-midi.
+    model, var, employees = sm.model, sm.var, sm.employees
+    for e in employees:
+        has_morning_early_phone = {
+            d: model.new_bool_var(f"morning_early_phone_{e}_{d}") for d in sm.horizon
+        }
+        for d in sm.horizon:
+            early = has_morning_early_phone[d]
+            no_phone_morning = sm.has_morning_without_phone[e][d]
+            no_phone_afternoon = sm.has_afternoon_without_phone[e][d]
+            phone = {s: var(e, "Téléphone", d, s) for s in shifts}
+            early_morning_shifts, late_morning_shifts, early_block, late_block = phone_blocks_of_day(d)
+            size = len(early_block)
+
+            sm.add_rule("phone_blocks", sum(phone[s] for s in early_morning_shifts) == 3
+                                        ).only_enforce_if(early).only_enforce_if(~no_phone_morning)
+            sm.add_rule("phone_blocks", sum(phone[s] for s in early_morning_shifts) == 0
+                                        ).only_enforce_if(~early)
+            sm.add_rule("phone_blocks", sum(phone[s] for s in late_morning_shifts) == 3
+                                        ).only_enforce_if(~early).only_enforce_if(~no_phone_morning)
+            sm.add_rule("phone_blocks", sum(phone[s] for s in late_morning_shifts) == 0
+                                        ).only_enforce_if(early)
+
+            sm.add_rule("phone_blocks", sum(phone[s] for s in early_block) == size
+                                        ).only_enforce_if(early).only_enforce_if(~no_phone_afternoon)
+            sm.add_rule("phone_blocks", sum(phone[s] for s in early_block) == 0
+                                        ).only_enforce_if(~early)
+            sm.add_rule("phone_blocks", sum(phone[s] for s in late_block) == size
+                                        ).only_enforce_if(~early).only_enforce_if(~no_phone_afternoon)
+            sm.add_rule("phone_blocks", sum(phone[s] for s in late_block) == 0
+                                        ).only_enforce_if(early)
+
+
+# Encodage compact des règles "consecutive" et "phone_blocks" : une contrainte
+# globale (automate, table) par séquence au lieu de sommes glissantes ou réifiées.
+# Le solveur propage directement sur les séquences autorisées.
+
+def window_automaton(window: int, max_ones: int) -> List[Tuple[int, int, int]]:
+    """Transitions d'un automate : au plus `max_ones` 1 dans toute fenêtre de `window` valeurs
+
+    L'état est formé des `window - 1` dernières valeurs lues.
+    """
+    mask = (1 << (window - 1)) - 1
+    return [(state, value, ((state << 1) | value) & mask)
+            for state in range(1 << (window - 1))
+            for value in (0, 1)
+            if bin(state).count("1") + value <= max_ones]
+
+
+def phone_block_slots(d: str) -> List[str]:
+    """Les créneaux couverts par `phone_block_patterns(d)`, dans l'ordre des motifs"""
+    blocks = [s for block in phone_blocks_of_day(d) for s in block]
+    if d == "Friday":
+        return blocks
+    # Un créneau de téléphone l'après-midi hors des blocs (13h30) compte pour la
+    # demi-journée : il impose alors un bloc complet.
+    return blocks + [s for s in afternoon_shifts if s in get_shifts_for_day(d) and s not in blocks]
+
+
+def phone_block_patterns(d: str) -> List[Tuple[int, ...]]:
+    """Affectations autorisées des créneaux de `phone_block_slots(d)`
+
+    Chaque demi-journée : le bloc tôt, le bloc tard ou rien, et le même choix
+    tôt / tard matin et après-midi. Le vendredi après-midi, sans demi-journée sans
+    téléphone à respecter, le bloc choisi peut n'être que partiellement tenu.
+    """
+    _, _, early_block, _ = phone_blocks_of_day(d)
+    size = len(early_block)
+    extra = len(phone_block_slots(d)) - 6 - 2 * size
+    patterns = set()
+    for early in (True, False):
+        morning_options = [(0,) * 6, (1, 1, 1, 0, 0, 0) if early else (0, 0, 0, 1, 1, 1)]
+        if d == "Friday":
+            active = list(itertools.product((0, 1), repeat=size))
+        else:
+            active = [(0,) * size, (1,) * size]
+        afternoon_options = []
+        for block in active:
+            blocks = block + (0,) * size if early else (0,) * size + block
+            extras = itertools.product((0, 1), repeat=extra) if any(block) else [(0,) * extra]
+            afternoon_options.extend(blocks + x for x in extras)
+        patterns.update(m + a for m in morning_options for a in afternoon_options)
+    return sorted(patterns)
+
+
+def _add_consecutive_automaton(sm: ScheduleModel) -> None:
+    # Pas + de 3 créneaux à la suite pour chaque rôle sauf Téléphone, maximum 4 créneaux :
+    # au plus 2 créneaux sur 4 le matin, au plus 4 sur 5 l'après-midi.
+    model, var = sm.model, sm.var
+    morning_transitions = window_automaton(4, 2)
+    afternoon_transitions = window_automaton(5, 4)
+    morning_states = sorted({t[2] for t in morning_transitions} | {0})
+    afternoon_states = sorted({t[2] for t in afternoon_transitions} | {0})
+    for e in sm.employees:
+        for d in sm.horizon:
+            for r in sm.schedule[e]:
+                if r == "Téléphone":
+                    continue
+                model.add_automaton([var(e, r, d, s) for s in morning_shifts],
+                                    0, morning_states, morning_transitions)
+                model.add_automaton([var(e, r, d, s) for s in afternoon_shifts],
+                                    0, afternoon_states, afternoon_transitions)
+
+
+def _add_phone_blocks_table(sm: ScheduleModel) -> None:
+    # Organisation du téléphone en 'créneaux' de 1h30 le matin / 2h l'après-midi :
+    # une table des affectations autorisées par employé et par jour. Qu'une
+    # demi-journée sans bloc soit sans téléphone du tout est imposé par la règle
+    # "half_day_no_phone", dont cette règle dépend.
+    model, var = sm.model, sm.var
+    for e in sm.employees:
+        if "Téléphone" not in sm.schedule[e]:
+            continue
+        for d in sm.horizon:
+            slots = phone_block_slots(d)
+            model.add_allowed_assignments([var(e, "Téléphone", d, s) for s in slots],
+                                          phone_block_patterns(d))
+
+
+# Les blocs de contraintes associés à chaque règle, dans l'ordre de RULES.
+RULE_BUILDERS: Dict[str, Callable[[ScheduleModel], None]] = {
+    "phone_coverage": _add_phone_coverage,
+    "intercom_coverage": _add_intercom_coverage,
+    "slack_max": _add_slack_max,
+    "slack_each": _add_slack_each,
+    "half_day_no_phone": _add_half_day_no_phone,
+    "slack_half_day": _add_slack_half_day,
+    "equity": _add_equity,
+    "consecutive": _add_consecutive,
+    "phone_blocks": _add_phone_blocks,
+}
+assert list(RULE_BUILDERS) == list(RULES)
+
+# Encodages disponibles : "compact" remplace les blocs de RULE_BUILDERS par ceux
+# de COMPACT_BUILDERS.
+ENCODINGS: Dict[str, str] = {
+    "linear": "Sommes linéaires (fenêtres glissantes, sommes réifiées)",
+    "compact": "Automates et tables (expérimental, souvent plus lent)",
+}
+COMPACT_BUILDERS: Dict[str, Callable[[ScheduleModel], None]] = {
+    "consecutive": _add_consecutive_automaton,
+    "phone_blocks": _add_phone_blocks_table,
+}
+
+
+def check_encoding(encoding: str) -> None:
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Encodage inconnu : {encoding} "
+                         f"(disponibles : {', '.join(ENCODINGS)})")
+
+
+# Blocs dont chaque contrainte ne concerne qu'un employé : ils sont construits
+# employé par employé, les autres portent sur toute une squad.
+EMPLOYEE_BLOCKS = {"base", "slack_each", "half_day_no_phone", "equity_totals", "consecutive",
+                   "phone_blocks"}
+
+
+def constraint_blocks(rules: Dict[str, bool], encoding: str,
+                      relaxed: Collection[str]) -> List[Tuple[str, Callable[[ScheduleModel], None]]]:
+    """Les blocs de contraintes à construire pour ces règles, dans l'ordre
+
+    Les règles de `relaxed` (souples ou diagnostiquées) gardent la formulation
+    linéaire, seule à pouvoir être relâchée contrainte par contrainte.
+    """
+    blocks = [("base", _add_base_constraints)]
+    for rule, builder in RULE_BUILDERS.items():
+        if encoding == "compact" and rule not in relaxed:
+            builder = COMPACT_BUILDERS.get(rule, builder)
+        if rules[rule]:
+            if rule == "equity":
+                # Les totaux par personne ne changent pas quand l'équipe change.
+                blocks.append(("equity_totals", _add_equity_totals))
+            blocks.append((rule, builder))
+    return blocks
+
+
+def _employee_variables(sm: ScheduleModel, e: str) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    # Seules les affectations possibles ont une variable : rôles attribués à
+    # l'employé, créneaux où il travaille.
+    return {r: {d: {s: sm.model.new_bool_var(f"schedule_{e}_{r}_{d}_{s}")
+                    for s in sm.working_shifts(e, d)}
+                for d in sm.horizon}
+            for r in roles if r in sm.employees[e]["roles"]}
+
+
+def _add_block(sm: ScheduleModel, name: str, builder: Callable[[ScheduleModel], None],
+               members: Optional[List[str]] = None) -> None:
+    """Ajoute un bloc de contraintes en relevant les contraintes créées
+
+    Un bloc de EMPLOYEE_BLOCKS est construit pour chacun des `members` (par défaut
+    tous les employés).
+    """
+    constraints = sm.model.proto.constraints
+    if name not in EMPLOYEE_BLOCKS:
+        start = len(constraints)
+        builder(sm)
+        sm.shared_constraints[name] = (start, len(constraints))
+        return
+    for e in sm.employees if members is None else members:
+        start = len(constraints)
+        builder(replace(sm, employees={e: sm.employees[e]}))
+        sm.employee_constraints.setdefault(e, []).append((start, len(constraints)))
+
+
+def _clear_constraints(sm: ScheduleModel, start: int, end: int) -> None:
+    # Une contrainte vide ne contraint rien : c'est la façon de la retirer sans
+    # décaler les indices des autres.
+    constraints = sm.model.proto.constraints
+    empty = cp_model_helper.ConstraintProto()
+    for i in range(start, end):
+        constraints[i].copy_from(empty)
+        sm.penalties.pop(i, None)
+    sm.cleared_constraints += end - start
+
+
+def build_model(employees: Dict[str, Any], rules: Optional[Dict[str, bool]] = None,
+                instrument: bool = False, horizon: Optional[List[str]] = None,
+                squads: Optional[List[str]] = None, encoding: str = "linear",
+                soft: Optional[Dict[str, int]] = None, guarded: bool = False) -> ScheduleModel:
+    """Construit le modèle CP-SAT pour les employés et les règles actives
+
+    Avec `instrument`, le temps de construction et la taille ajoutée par chaque
+    bloc de contraintes sont relevés dans `build_report`. `horizon` (jours) et
+    `squads` (équipes) restreignent le modèle à une partie du planning. `encoding`
+    choisit la formulation des règles (voir ENCODINGS), sans changer les solutions.
+    Les règles de `soft` (règle -> poids) peuvent être enfreintes, moyennant une
+    pénalité à minimiser. Avec `guarded`, les contraintes de chaque règle active
+    dépendent d'un littéral posé en hypothèse (voir diagnosis.py).
+    """
+    check_encoding(encoding)
+    employees = normalize_employees(employees)
+    rules = normalize_rules(rules)
+    soft = normalize_soft(soft, rules)
+    horizon = list(days) if horizon is None else [d for d in days if d in horizon]
+    teams = team_index(employees)
+    if squads is not None:
+        teams = {team: teams[team] for team in squads}
+    model = cp_model.CpModel()
+    profiler = BuildProfiler(model) if instrument else None
+    with block_context(profiler, "variables"):
+        sm = ScheduleModel(model=model, employees=employees, rules=rules, teams=teams,
+                           schedule={}, horizon=horizon, encoding=encoding, soft=soft)
+        for e in employees:
+            sm.set_availability(e)
+        sm.schedule = {e: _employee_variables(sm, e) for e in employees}
+        sm.index_variables()
+    if guarded:
+        sm.guards = {rule: model.new_bool_var(f"assume_{rule}") for rule in RULES if rules[rule]}
+        model.add_assumptions(list(sm.guards.values()))
+    for name, builder in constraint_blocks(rules, encoding, set(soft) | set(sm.guards)):
+        with block_context(profiler, name):
+            _add_block(sm, name, builder)
+    sm.update_objective()
+    if profiler is not None:
+        sm.build_report = profiler.blocks
+    return sm
+
+
+def update_model(sm: ScheduleModel, employees: Dict[str, Any]) -> None:
+    """Met à jour un modèle de toute la semaine pour une nouvelle équipe, sans le reconstruire
+
+    Les employés retirés (ou dont l'équipe ou les rôles changent) sont désactivés :
+    leurs contraintes sont effacées et leurs variables fixées à 0. Seuls les
+    employés ajoutés sont construits, puis les blocs qui portent sur toute une squad.
+    """
+    employees = normalize_employees(employees)
+    variables = sm.model.proto.variables
+    changed = [e for e in sm.employees if employees.get(e) != sm.employees[e]]
+    for e in changed:
+        for start, end in sm.employee_constraints.pop(e, []):
+            _clear_constraints(sm, start, end)
+        for role_schedule in sm.schedule.pop(e).values():
+            for day_schedule in role_schedule.values():
+                for literal in day_schedule.values():
+                    variables[literal.index].domain[1] = 0
+        sm.has_morning_without_phone.pop(e, None)
+        sm.has_afternoon_without_phone.pop(e, None)
+        sm.role_totals.pop(e, None)
+        sm.employee_index.pop(e, None)
+        sm.available.pop(e, None)
+        sm.working.pop(e, None)
+    added = [e for e in employees if e not in sm.schedule]
+    sm.employees = employees
+    sm.teams = team_index(employees)
+    for e in added:
+        sm.set_availability(e)
+        sm.schedule[e] = _employee_variables(sm, e)
+    for name, builder in constraint_blocks(sm.rules, sm.encoding, set(sm.soft) | set(sm.guards)):
+        if name in EMPLOYEE_BLOCKS:
+            _add_block(sm, name, builder, added)
+        else:
+            _clear_constraints(sm, *sm.shared_constraints[name])
+            _add_block(sm, name, builder)
+    sm.index_variables()
+    sm.update_objective()
+
+
+# Derniers modèles construits, par configuration de règles et encodage : quand
+# seule l'équipe change, le modèle est mis à jour au lieu d'être reconstruit.
+MODEL_CACHE_SIZE = 8
+_models: "OrderedDict[str, ScheduleModel]" = OrderedDict()
+_models_lock = threading.Lock()
+
+
+def model_for(employees: Dict[str, Any], rules: Optional[Dict[str, bool]] = None,
+              encoding: str = "linear", soft: Optional[Dict[str, int]] = None) -> ScheduleModel:
+    """Modèle de la semaine, obtenu si possible en mettant à jour le dernier construit
+
+    Renvoie une copie : ce qu'une résolution y ajoute (planning précédent,
+    historique) ne touche pas le modèle gardé. Quand les contraintes effacées au
+    fil des mises à jour dépassent la moitié du modèle, il est reconstruit.
+    """
+    soft = normalize_soft(soft, normalize_rules(rules))
+    key = f"{rules_key(rules)}/{encoding}/{json.dumps(soft, sort_keys=True)}"
+    with _models_lock:
+        sm = _models.pop(key, None)
+        if sm is None or 2 * sm.cleared_constraints > len(sm.model.proto.constraints):
+            sm = build_model(employees, rules, encoding=encoding, soft=soft)
+        else:
+            update_model(sm, employees)
+        _models[key] = sm
+        while len(_models) > MODEL_CACHE_SIZE:
+            _models.popitem(last=False)
+        return replace(sm, model=sm.model.clone(), objective_terms=[],
+                       employees=dict(sm.employees), teams=dict(sm.teams),
+                       schedule=dict(sm.schedule),
+                       has_morning_without_phone=dict(sm.has_morning_without_phone),
+                       has_afternoon_without_phone=dict(sm.has_afternoon_without_phone),
+                       role_totals=dict(sm.role_totals), employee_index=dict(sm.employee_index),
+                       available=dict(sm.available), working=dict(sm.working),
+                       penalties=dict(sm.penalties),
+                       employee_constraints={}, shared_constraints={})
+
+
+def add_rotation_fairness(sm: ScheduleModel, history: History) -> None:
+    """Équilibre, dans chaque squad, les compteurs cumulés avec les semaines précédentes
+
+    Pour chaque rôle et pour le bloc de téléphone de l'ouverture, l'écart entre
+    le plus et le moins chargé (semaines précédentes comprises) est minimisé.
+    La règle d'équité de la semaine reste une contrainte.
+    """
+    model, var = sm.model, sm.var
+    carried = carried_counts(history, sm.employees)
+    for team, members in sm.teams.items():
+        if len(members) < 2:
+            continue
+        for key in role_dict[team] + [EARLY_PHONE]:
+            if key == EARLY_PHONE:
+                week = {e: sum(var(e, "Téléphone", d, EARLY_PHONE_SHIFT) for d in sm.horizon)
+                        for e in members}
+            else:
+                week = {e: sum(var(e, key, d, s)
+                               for d in sm.horizon for s in sm.working_shifts(e, d))
+                        for e in members}
+            upper = max(carried[e][key] for e in members) + len(sm.horizon) * len(shifts)
+            totals = [carried[e][key] + week[e] for e in members]
+            lowest = model.new_int_var(0, upper, f"cumulative_min_{team}_{key}")
+            model.add_min_equality(lowest, totals)
+            highest = model.new_int_var(0, upper, f"cumulative_max_{team}_{key}")
+            model.add_max_equality(highest, totals)
+            sm.add_objective(highest - lowest)
+
+
+# Repartir d'un planning précédent.
+#   - "hint" : la solution précédente sert de point de départ (AddHint) ;
+#   - "soft" : on minimise le nombre de créneaux modifiés pour les employés repris ;
+#   - "fixed" : les employés repris gardent exactement leur planning.
+STABILITY_MODES: Dict[str, str] = {
+    "hint": "Partir du planning précédent",
+    "soft": "Déplacer le moins de monde possible",
+    "fixed": "Ne pas toucher au planning des autres collaborateurs",
+}
+
+
+def previous_values(sm: ScheduleModel, previous: ScheduleResult) -> Tuple[np.ndarray, np.ndarray]:
+    """Valeur précédente de chaque variable de décision, et masque des variables concernées
+
+    Seuls les employés présents dans le planning précédent, dont les rôles tenus
+    sont toujours autorisés, sont repris.
+    """
+    previous_pos = {e: i for i, e in enumerate(previous.employees)}
+    n_cells = len(days) * len(shifts)
+    mapping = np.full(len(sm.employees), -1, dtype=np.int64)
+    for e_idx, e in enumerate(sm.employees):
+        if e not in previous_pos:
+            continue
+        codes = set(np.unique(previous.grid[previous_pos[e]]).tolist()) - {NO_ROLE}
+        if codes <= {ROLE_CODES[r] for r in sm.schedule[e]}:
+            mapping[e_idx] = previous_pos[e]
+    employee_of_var = sm.cell_index // n_cells
+    reused = mapping[employee_of_var] >= 0
+    previous_cell = mapping[employee_of_var] * n_cells + sm.cell_index % n_cells
+    values = np.zeros(len(sm.var_index), dtype=bool)
+    values[reused] = previous.grid.reshape(-1)[previous_cell[reused]] == sm.role_code[reused]
+    return values, reused
+
+
+def apply_previous(sm: ScheduleModel, previous: ScheduleResult, stability: str = "hint") -> int:
+    """Ajoute au modèle les indications (ou contraintes) issues du planning précédent
+
+    Renvoie le nombre d'employés repris.
+    """
+    if stability not in STABILITY_MODES:
+        raise ValueError(f"Mode de stabilité inconnu : {stability} "
+                         f"(disponibles : {', '.join(STABILITY_MODES)})")
+    values, reused = previous_values(sm, previous)
+    kept = [(sm.literals[i], bool(values[i])) for i in np.flatnonzero(reused)]
+    for literal, value in kept:
+        sm.model.add_hint(literal, value)
+    if stability == "fixed":
+        sm.model.add_bool_and([literal if value else ~literal for literal, value in kept])
+    elif stability == "soft":
+        sm.add_objective(sum((1 - literal) if value else literal for literal, value in kept))
+    n_cells = len(days) * len(shifts)
+    return len(np.unique(sm.cell_index[reused] // n_cells))
+
+
+def changed_cells(result: ScheduleResult, previous: ScheduleResult) -> int:
+    """Nombre de créneaux modifiés, pour les employés présents dans les deux plannings"""
+    previous_pos = {e: i for i, e in enumerate(previous.employees)}
+    common = [(i, previous_pos[e]) for i, e in enumerate(result.employees) if e in previous_pos]
+    if not common:
+        return 0
+    current_idx, previous_idx = map(list, zip(*common))
+    return int((result.grid[current_idx] != previous.grid[previous_idx]).sum())
+
+
+def extract_grid(sm: ScheduleModel,
+                 solver: Union[cp_model.CpSolver, cp_model.CpSolverSolutionCallback]) -> np.ndarray:
+    """Lit toute la solution d'un coup dans une grille (employé x jour x créneau) de codes de rôle"""
+    values = np.asarray(solver.response_proto.solution)
+    chosen = values[sm.var_index] == 1
+    grid = np.full(len(sm.employees) * len(days) * len(shifts), NO_ROLE, dtype=np.int8)
+    grid[sm.cell_index[chosen]] = sm.role_code[chosen]
+    return grid.reshape(len(sm.employees), len(days), len(shifts))
+
+
+def rule_violations(sm: ScheduleModel,
+                    solver: Union[cp_model.CpSolver, cp_model.CpSolverSolutionCallback]) -> Dict[str, int]:
+    """Nombre de contraintes de chaque règle souple enfreintes par la solution"""
+    violations = {rule: 0 for rule in sm.soft}
+    for rule, term in sm.penalties.values():
+        violations[rule] += int(solver.value(term))
+    return violations
+
+
+def _result(sm: ScheduleModel, status: int, status_name: str, wall_time: float,
+            profile: SolveProfile, grid: Optional[np.ndarray], **extra: Any) -> ScheduleResult:
+    # Les résultats sont partagés par le cache : on les fige.
+    if grid is not None:
+        grid.setflags(write=False)
+    return ScheduleResult(status=status,
+                          status_name=status_name,
+                          wall_time=wall_time,
+                          profile=profile.name,
+                          employees=tuple(sm.employees),
+                          grid=grid,
+                          open_mask=open_slots_mask(sm.employees),
+                          **extra)
+
+
+class SolveControl:
+    """Permet d'arrêter depuis un autre thread une résolution en cours"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # Plusieurs solveurs en parallèle pour une résolution décomposée.
+        self._solvers: List[cp_model.CpSolver] = []
+        self.stopped = False
+
+    def attach(self, solver: cp_model.CpSolver) -> None:
+        """Associe un solveur qui va être lancé"""
+        with self._lock:
+            self._solvers.append(solver)
+            if self.stopped:
+                # Arrêt demandé avant le lancement : aucun temps de recherche.
+                solver.parameters.max_time_in_seconds = 0.0
+
+    def stop(self) -> None:
+        """Arrête la recherche ; la meilleure solution trouvée est conservée"""
+        with self._lock:
+            self.stopped = True
+            for solver in self._solvers:
+                solver.stop_search()
+
+
+class _SolutionPublisher(cp_model.CpSolverSolutionCallback):
+    """Transmet chaque nouvelle solution trouvée pendant la recherche"""
+
+    def __init__(self, sm: ScheduleModel, profile: SolveProfile,
+                 on_solution: Callable[[ScheduleResult], None]) -> None:
+        super().__init__()
+        self._sm = sm
+        self._profile = profile
+        self._on_solution = on_solution
+
+    def on_solution_callback(self) -> None:
+        self._on_solution(_result(self._sm, cp_model.FEASIBLE, "FEASIBLE", self.wall_time,
+                                  self._profile, extract_grid(self._sm, self),
+                                  violations=rule_violations(self._sm, self) if self._sm.soft else None))
+
+
+def _solve(employees: Dict[str, Any], rules: Optional[Dict[str, bool]],
+           profile: SolveProfile,
+           on_solution: Optional[Callable[[ScheduleResult], None]] = None,
+           control: Optional[SolveControl] = None,
+           previous: Optional[ScheduleResult] = None,
+           stability: str = "hint",
+           instrument: bool = False,
+           decompose: bool = False,
+           encoding: str = "linear",
+           history: Optional[History] = None,
+           soft: Optional[Dict[str, int]] = None,
+           symmetry: bool = False) -> ScheduleResult:
+    start = time.perf_counter()
+    # Import local : le pré-contrôle s'appuie sur ce module.
+    from .diagnosis import precheck
+    # Seules les règles imposées peuvent rendre le planning impossible.
+    conflicts = precheck(employees, {rule: active and rule not in (soft or {})
+                                     for rule, active in normalize_rules(rules).items()})
+    if conflicts:
+        employees = normalize_employees(employees)
+        return ScheduleResult(status=cp_model.INFEASIBLE, status_name="INFEASIBLE",
+                              wall_time=time.perf_counter() - start, profile=profile.name,
+                              employees=tuple(employees), open_mask=open_slots_mask(employees),
+                              stability=stability, conflicts=conflicts)
+    if decompose and stability == "hint" and history is None and not soft:
+        # Import local : la résolution décomposée s'appuie sur ce module.
+        from .decompose import solve_decomposed
+        return solve_decomposed(employees, rules, profile, on_solution, control, previous, encoding)
+    if instrument:
+        # Les mesures portent sur une construction complète.
+        sm = build_model(employees, rules, instrument, encoding=encoding, soft=soft)
+    else:
+        sm = model_for(employees, rules, encoding, soft)
+    if history is not None:
+        add_rotation_fairness(sm, history)
+    reused = apply_previous(sm, previous, stability) if previous is not None else 0
+    symmetric = 0
+    if symmetry:
+        # Import local : le bris de symétrie s'appuie sur ce module.
+        from .symmetry import add_symmetry_breaking
+        profiler = BuildProfiler(sm.model) if instrument else None
+        with block_context(profiler, "symmetry"):
+            symmetric = add_symmetry_breaking(sm, history, previous, stability)
+        if profiler is not None:
+            sm.build_report = sm.build_report + profiler.blocks
+    solver = cp_model.CpSolver()
+    profile.apply(solver)
+    if reused:
+        # Le planning précédent n'est en général plus tout à fait valable :
+        # le solveur part de là et le répare au lieu de l'abandonner.
+        solver.parameters.repair_hint = True
+    if instrument:
+        enable_solve_log(solver)
+    if control is not None:
+        control.attach(solver)
+    if on_solution is not None:
+        status = solver.solve(sm.model, _SolutionPublisher(sm, profile, on_solution))
+    else:
+        status = solver.solve(sm.model)
+    if status == cp_model.INFEASIBLE and stability == "fixed" and reused:
+        # Garder tout le monde en place est impossible : on déplace le moins de monde possible.
+        result = _solve(employees, rules, profile, on_solution, control, previous, "soft", instrument,
+                        encoding=encoding, history=history, soft=soft, symmetry=symmetry)
+        return replace(result, wall_time=time.perf_counter() - start)
+    found = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    grid = extract_grid(sm, solver) if found else None
+    result = _result(sm, status, solver.status_name(status), time.perf_counter() - start,
+                     profile, grid, stability=stability, reused_employees=reused,
+                     build_report=sm.build_report,
+                     solver_stats=solver_stats(solver) if instrument else None,
+                     violations=rule_violations(sm, solver) if found and sm.soft else None,
+                     symmetric_employees=symmetric)
+    if found and previous is not None:
+        result = replace(result, changed_cells=changed_cells(result, previous))
+    return result
+
+
+# Cache des solutions, partagé par toutes les sessions du même processus.
+CACHE_SIZE = 64
+_cache: "OrderedDict[str, ScheduleResult]" = OrderedDict()
+_cache_lock = threading.Lock()
+_key_locks: Dict[str, threading.Lock] = {}
+# Dernière solution trouvée pour chaque configuration de règles (avec l'équipe
+# correspondante), pour repartir de là quand l'équipe change.
+_last_solutions: Dict[str, Tuple[Employees, ScheduleResult]] = {}
+# Stockage sur disque, partagé entre processus : consulté quand le cache ne
+# connaît pas la demande (voir store.py).
+_store: Optional["ScheduleStore"] = None
+
+
+def set_store(store: Optional[Union[str, Path, "ScheduleStore"]]) -> Optional["ScheduleStore"]:
+    """Garde les plannings résolus dans une base sur disque (None : en mémoire seulement)"""
+    global _store
+    # Import local : le stockage s'appuie sur ce module.
+    from .store import ScheduleStore
+    if store is not None and not isinstance(store, ScheduleStore):
+        store = ScheduleStore(store)
+    _store = store
+    return store
+
+
+def clear_cache() -> None:
+    """Vide le cache des solutions, les dernières solutions connues et les modèles construits"""
+    with _cache_lock:
+        _cache.clear()
+        _last_solutions.clear()
+    with _models_lock:
+        _models.clear()
+
+
+def cached_result(key: str) -> Optional[ScheduleResult]:
+    """Le résultat déjà connu pour cette clé de demande : cache, puis stockage sur disque"""
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    store = _store
+    result = store.get(key) if store is not None else None
+    if result is not None:
+        with _cache_lock:
+            _cache[key] = result
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return result
+
+
+def _warm_start_previous(employees: Dict[str, Any], rules: Optional[Dict[str, bool]],
+                         previous: Optional[ScheduleResult], stability: str,
+                         warm_start: bool) -> Optional[ScheduleResult]:
+    # Planning dont la résolution repart : `previous`, ou en mode "hint" la dernière
+    # solution trouvée pour les mêmes règles. Celle-ci peut venir d'une autre
+    # session : simple point de départ, elle ne doit pas changer le problème.
+    if warm_start and previous is None and stability == "hint":
+        with _cache_lock:
+            last = _last_solutions.get(rules_key(rules))
+        # Même équipe que la dernière fois : rien à reprendre, le cache suffit.
+        if last is not None and last[0] != canonical_employees(employees):
+            previous = last[1]
+    if not warm_start or (previous is not None and not previous.found):
+        previous = None
+    return previous
+
+
+def _remember_solution(employees: Dict[str, Any], rules: Optional[Dict[str, bool]],
+                       result: ScheduleResult) -> None:
+    if result.found:
+        with _cache_lock:
+            _last_solutions[rules_key(rules)] = (canonical_employees(employees), result)
+
+
+def solve_key(employees: Dict[str, Any], rules: Optional[Dict[str, bool]] = None,
+              profile: Optional[Union[str, SolveProfile]] = None,
+              previous: Optional[ScheduleResult] = None,
+              stability: str = "hint",
+              warm_start: bool = True,
+              instrument: bool = False,
+              decompose: bool = False,
+              encoding: str = "linear",
+              history: Optional[History] = None,
+              soft: Optional[Dict[str, int]] = None,
+              symmetry: bool = False) -> str:
+    """La clé sous laquelle `solve`, avec les mêmes arguments, range son résultat"""
+    previous = _warm_start_previous(employees, rules, previous, stability, warm_start)
+    return request_key(employees, rules, get_profile(profile), stability, previous, instrument,
+                       decompose, encoding, history, normalize_soft(soft, normalize_rules(rules)),
+                       symmetry)
+
+
+def last_solution(rules: Optional[Dict[str, bool]] = None) -> Optional[ScheduleResult]:
+    """Dernière solution trouvée pour cette configuration de règles"""
+    with _cache_lock:
+        last = _last_solutions.get(rules_key(rules))
+    return last[1] if last is not None else None
+
+
+def solve(employees: Dict[str, Any], rules: Optional[Dict[str, bool]] = None,
+          profile: Optional[Union[str, SolveProfile]] = None,
+          use_cache: bool = True,
+          on_solution: Optional[Callable[[ScheduleResult], None]] = None,
+          control: Optional[SolveControl] = None,
+          previous: Optional[ScheduleResult] = None,
+          stability: str = "hint",
+          warm_start: bool = True,
+          instrument: bool = False,
+          decompose: bool = False,
+          encoding: str = "linear",
+          history: Optional[History] = None,
+          soft: Optional[Dict[str, int]] = None,
+          symmetry: bool = False) -> ScheduleResult:
+    """Construit et résout le planning, en réutilisant une solution déjà calculée si possible
+
+    `on_solution` est appelé (depuis le thread du solveur) à chaque solution trouvée
+    pendant la recherche ; `control` permet de l'interrompre depuis un autre thread.
+    Avec `warm_start`, la résolution repart de `previous` selon le mode `stability`.
+    Sans `previous`, le mode "hint" part de la dernière solution trouvée pour les
+    mêmes règles, dans tout le processus ; les autres modes n'en reprennent aucune.
+    Avec `instrument`, le résultat contient les mesures de construction du modèle
+    et les statistiques du solveur.
+    Avec `decompose`, la semaine est résolue jour par jour en parallèle (voir
+    decompose.py) ; seulement en mode "hint", sans mesures de construction.
+    `encoding` choisit la formulation des règles (voir ENCODINGS).
+    Avec `history`, les rôles et les débuts de journée au téléphone sont équilibrés
+    en tenant compte des semaines précédentes (voir history.py) ; la semaine n'est
+    alors pas décomposée.
+    Les règles de `soft` (règle -> poids, voir SOFT_WEIGHTS) deviennent des
+    préférences : le planning peut les enfreindre, au moindre coût pondéré, et
+    `violations` compte les contraintes enfreintes pour chacune. La semaine n'est alors pas décomposée.
+    Avec `symmetry`, les plannings des employés interchangeables sont ordonnés
+    (voir symmetry.py) : mêmes solutions à une permutation près, preuves plus
+    rapides ; sans effet sur la résolution décomposée.
+    """
+    profile = get_profile(profile)
+    check_encoding(encoding)
+    soft = normalize_soft(soft, normalize_rules(rules))
+    if stability not in STABILITY_MODES:
+        raise ValueError(f"Mode de stabilité inconnu : {stability} "
+                         f"(disponibles : {', '.join(STABILITY_MODES)})")
+    previous = _warm_start_previous(employees, rules, previous, stability, warm_start)
+    if not use_cache:
+        result = _solve(employees, rules, profile, on_solution, control, previous, stability,
+                        instrument, decompose, encoding, history, soft, symmetry)
+    else:
+        result = _solve_cached(employees, rules, profile, on_solution, control, previous, stability,
+                               instrument, decompose, encoding, history, soft, symmetry)
+    _remember_solution(employees, rules, result)
+    return result
+
+
+def _solve_cached(employees: Dict[str, Any], rules: Optional[Dict[str, bool]],
+                  profile: SolveProfile,
+                  on_solution: Optional[Callable[[ScheduleResult], None]],
+                  control: Optional[SolveControl],
+                  previous: Optional[ScheduleResult],
+                  stability: str,
+                  instrument: bool,
+                  decompose: bool,
+                  encoding: str,
+                  history: Optional[History],
+                  soft: Dict[str, int],
+                  symmetry: bool) -> ScheduleResult:
+    key = request_key(employees, rules, profile, stability, previous, instrument, decompose,
+                      encoding, history, soft, symmetry)
+    # Un verrou par clé : deux demandes identiques simultanées ne résolvent qu'une fois.
+    with _cache_lock:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    try:
+        with key_lock:
+            # Les mesures d'une résolution instrumentée ne sont pas enregistrées :
+            # le stockage ne les connaît pas.
+            result = cached_result(key)
+            if result is not None:
+                return result
+            store = _store
+            result = _solve(employees, rules, profile, on_solution, control, previous, stability,
+                            instrument, decompose, encoding, history, soft, symmetry)
+            # Un résultat UNKNOWN ou interrompu dépend seulement du temps
+            # imparti : on ne le garde pas.
+            if result.status == cp_model.UNKNOWN or (control and control.stopped):
+                return result
+            if store is not None and not instrument:
+                store.put(key, result, employees, rules)
+            with _cache_lock:
+                _cache[key] = result
+                while len(_cache) > CACHE_SIZE:
+                    _cache.popitem(last=False)
+    finally:
+        with _cache_lock:
+            _key_locks.pop(key, None)
+    return result
+
+
+def plan_weeks(employees: Dict[str, Any], weeks: int,
+               rules: Optional[Dict[str, bool]] = None,
+               profile: Optional[Union[str, SolveProfile]] = None,
+               history: Optional[History] = None,
+               encoding: str = "linear") -> Tuple[List[ScheduleResult], History]:
+    """Planifie plusieurs semaines d'affilée, chacune équilibrée avec les précédentes
+
+    Les semaines sont résolues l'une après l'autre avec l'historique des précédentes ;
+    on s'arrête à la première semaine sans planning. Renvoie les plannings et
+    l'historique complété.
+    """
+    history = dict(history or {})
+    results: List[ScheduleResult] = []
+    for _ in range(weeks):
+        result = solve(employees, rules, profile, use_cache=False, warm_start=False,
+                       encoding=encoding, history=history)
+        results.append(result)
+        if not result.found:
+            break
+        history = record_week(history, result)
+    return results, history
@@ -0,0 +1,78 @@
+"""Historique des semaines planifiées : compteurs cumulés par employé, pour l'équité dans la durée."""
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
+
+from .config import ROLE_CODES, roles, shifts
+from .roster import normalize_employees, team_index
+
+if TYPE_CHECKING:
+    from .engine import ScheduleResult
+
+# nom -> {"weeks": semaines planifiées, "counts": compteur -> total}
+History = Dict[str, Dict[str, Any]]
+
+# Le bloc de téléphone le moins apprécié : celui de l'ouverture, à 9h.
+EARLY_PHONE = "early_phone"
+EARLY_PHONE_SHIFT = "09:00"
+# Compteurs suivis d'une semaine à l'autre : créneaux par rôle, jours commencés au téléphone.
+COUNTERS: List[str] = list(roles) + [EARLY_PHONE]
+
+
+def week_counts(result: "ScheduleResult") -> Dict[str, Dict[str, int]]:
+    """Compteurs de la semaine planifiée, pour chaque employé"""
+    early = shifts.index(EARLY_PHONE_SHIFT)
+    counts = {}
+    for e_idx, e in enumerate(result.employees):
+        row = result.grid[e_idx]
+        counts[e] = {r: int((row == ROLE_CODES[r]).sum()) for r in roles}
+        counts[e][EARLY_PHONE] = int((row[:, early] == ROLE_CODES["Téléphone"]).sum())
+    return counts
+
+
+def record_week(history: Optional[History], result: "ScheduleResult") -> History:
+    """Nouvel historique, avec la semaine planifiée en plus"""
+    updated = {e: {"weeks": entry["weeks"], "counts": dict(entry["counts"])}
+               for e, entry in (history or {}).items()}
+    for e, counts in week_counts(result).items():
+        entry = updated.setdefault(e, {"weeks": 0, "counts": {}})
+        entry["weeks"] += 1
+        for key, n in counts.items():
+            entry["counts"][key] = entry["counts"].get(key, 0) + n
+    return updated
+
+
+def carried_counts(history: History, employees: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+    """Compteurs cumulés des semaines précédentes, à équilibrer dans chaque squad
+
+    Un employé arrivé en cours de route est compté, pour les semaines qu'il n'a
+    pas faites, à la moyenne hebdomadaire de sa squad : il n'a pas à rattraper
+    tout le retard en une semaine.
+    """
+    employees = normalize_employees(employees)
+    carried = {}
+    for members in team_index(employees).values():
+        known = [history[e] for e in members if history.get(e, {}).get("weeks")]
+        weeks = max((h["weeks"] for h in known), default=0)
+        total_weeks = sum(h["weeks"] for h in known)
+        per_week = {key: sum(h["counts"].get(key, 0) for h in known) / total_weeks if known else 0.0
+                    for key in COUNTERS}
+        for e in members:
+            entry = history.get(e, {"weeks": 0, "counts": {}})
+            carried[e] = {key: entry["counts"].get(key, 0) + round((weeks - entry["weeks"]) * per_week[key])
+                          for key in COUNTERS}
+    return carried
+
+
+def load_history(path: Union[str, Path]) -> History:
+    """Lit un historique JSON ; un fichier absent donne un historique vide"""
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_history(history: History, path: Union[str, Path]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(history, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,224 @@
+"""Résolutions en arrière-plan : une file de tâches servie par un nombre limité de threads.
+
+Une interface soumet une demande, puis interroge la tâche (état, avancement,
+dernière solution provisoire) sans jamais attendre la fin de la recherche. Les
+demandes identiques, même venant de sessions différentes, partagent une seule
+tâche ; une tâche n'est arrêtée que lorsque plus personne ne l'attend. Le nombre
+de résolutions simultanées est borné pour protéger le processeur du serveur ; les
+demandes en trop attendent leur tour. Les résultats passent par `solve`, donc par
+son cache et par le stockage sur disque s'il est configuré. La recherche des
+règles en conflit (`diagnose`) passe par la même file.
+"""
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import replace
+from typing import Any, Callable, Dict, Optional, Union
+
+from .diagnosis import Diagnosis, diagnose
+from .engine import (ScheduleResult, SolveControl, _remember_solution, cached_result, request_key,
+                     solve, solve_key)
+from .profiles import SolveProfile, get_profile
+
+# Par défaut, une résolution simultanée pour 4 cœurs ; les cœurs sont partagés entre
+# les résolutions simultanées (voir JobQueue.submit).
+MAX_CONCURRENT_SOLVES = max(1, (os.cpu_count() or 1) // 4)
+# Tâches terminées gardées pour être consultées
+FINISHED_JOBS_KEPT = 64
+
+
+def job_key(employees: Dict[str, Any], rules: Optional[Dict[str, bool]] = None,
+            profile: Optional[Union[str, SolveProfile]] = None, **options: Any) -> str:
+    """Clé d'une demande soumise à la file : même clé, même tâche"""
+    key_options = {name: options[name] for name in
+                   ("stability", "previous", "instrument", "decompose", "encoding", "history",
+                    "soft", "symmetry")
+                   if name in options}
+    return f"{request_key(employees, rules, profile, **key_options)}/{options.get('stability', 'hint')}"
+
+
+def diagnosis_key(employees: Dict[str, Any], rules: Optional[Dict[str, bool]] = None,
+                  profile: Optional[Union[str, SolveProfile]] = None) -> str:
+    """Clé d'une recherche des règles en conflit soumise à la file"""
+    return f"diagnose/{request_key(employees, rules, profile)}"
+
+
+class SolveJob:
+    """Une résolution (ou une recherche des règles en conflit) soumise à la file"""
+
+    def __init__(self, key: str, profile: SolveProfile) -> None:
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.profile = profile
+        self.control = SolveControl()
+        # "queued", "running", puis "done", "cancelled" (arrêtée) ou "failed"
+        self.state = "queued"
+        # Un `Diagnosis` pour une tâche de `submit_diagnosis`
+        self.result: Optional[Union[ScheduleResult, Diagnosis]] = None
+        # Dernière solution trouvée pendant la recherche
+        self.latest: Optional[ScheduleResult] = None
+        self.error: Optional[str] = None
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        # Sessions qui attendent le résultat
+        self.subscribers = 0
+        self.future: Optional[Future] = None
+
+    @property
+    def done(self) -> bool:
+        return self.state in ("done", "cancelled", "failed")
+
+    @property
+    def elapsed(self) -> float:
+        """Temps de recherche écoulé"""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def progress(self) -> float:
+        """Part du temps imparti par le profil déjà consommée (entre 0 et 1)"""
+        if self.done:
+            return 1.0
+        return min(1.0, self.elapsed / self.profile.max_time_in_seconds)
+
+
+class JobQueue:
+    """File de résolutions servie par `max_concurrent` threads"""
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_SOLVES) -> None:
+        self.max_concurrent = max(1, max_concurrent)
+        # CP-SAT libère le GIL pendant la recherche : des threads suffisent, et
+        # ils partagent le cache des solutions et des modèles.
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent,
+                                            thread_name_prefix="solve")
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, SolveJob]" = OrderedDict()
+        # Clé de demande -> tâche non terminée, pour partager les demandes identiques
+        self._active: Dict[str, SolveJob] = {}
+
+    def submit(self, employees: Dict[str, Any], rules: Optional[Dict[str, bool]] = None,
+               profile: Optional[Union[str, SolveProfile]] = None, **options: Any) -> SolveJob:
+        """Soumet une résolution (mêmes options que `solve`) ; renvoie sa tâche, éventuellement partagée
+
+        Une demande déjà résolue (cache ou stockage sur disque) donne une tâche
+        terminée sans passer par la file. Chaque résolution dispose d'une part des
+        cœurs de la machine : au plus `max_concurrent` à la fois, elles n'en
+        utilisent pas plus qu'il n'y en a.
+        """
+        profile = get_profile(profile)
+        # La clé de la demande telle que l'appelant la calcule (voir `job_key`).
+        key = job_key(employees, rules, profile, **options)
+        profile = self._share_cores(profile)
+        if options.get("use_cache", True):
+            solve_options = {name: value for name, value in options.items() if name != "use_cache"}
+            result = cached_result(solve_key(employees, rules, profile, **solve_options))
+            if result is not None:
+                _remember_solution(employees, rules, result)
+                job = SolveJob(key, profile)
+                job.result = job.latest = result
+                job.state = "done"
+                job.started = job.finished = time.time()
+                job.subscribers = 1
+                with self._lock:
+                    self._jobs[job.id] = job
+                    self._prune()
+                return job
+
+        def work(job: SolveJob) -> ScheduleResult:
+            def publish(result: ScheduleResult) -> None:
+                job.latest = result
+
+            return solve(employees, rules, job.profile, on_solution=publish, control=job.control,
+                         **options)
+
+        return self._enqueue(key, profile, work)
+
+    def submit_diagnosis(self, employees: Dict[str, Any], rules: Optional[Dict[str, bool]] = None,
+                         profile: Optional[Union[str, SolveProfile]] = None) -> SolveJob:
+        """Soumet la recherche des règles en conflit (voir `diagnose`) ; le résultat est un `Diagnosis`"""
+        profile = get_profile(profile)
+        key = diagnosis_key(employees, rules, profile)
+        return self._enqueue(key, self._share_cores(profile),
+                             lambda job: diagnose(employees, rules, job.profile, control=job.control))
+
+    def _share_cores(self, profile: SolveProfile) -> SolveProfile:
+        # Au plus `max_concurrent` tâches à la fois : chacune a sa part des cœurs.
+        return replace(profile, num_workers=max(1, min(profile.num_workers,
+                                                       (os.cpu_count() or 1) // self.max_concurrent)))
+
+    def _enqueue(self, key: str, profile: SolveProfile,
+                 work: Callable[[SolveJob], Union[ScheduleResult, Diagnosis]]) -> SolveJob:
+        # La tâche active de même clé, ou une nouvelle tâche qui exécutera `work`.
+        with self._lock:
+            job = self._active.get(key)
+            if job is None:
+                job = SolveJob(key, profile)
+                self._active[key] = job
+                self._jobs[job.id] = job
+                self._prune()
+                job.future = self._executor.submit(self._run, job, work)
+            job.subscribers += 1
+            return job
+
+    def _run(self, job: SolveJob, work: Callable[[SolveJob], Union[ScheduleResult, Diagnosis]]) -> None:
+        job.started = time.time()
+        job.state = "running"
+        try:
+            job.result = work(job)
+            job.state = "cancelled" if job.control.stopped else "done"
+        except Exception:
+            job.error = traceback.format_exc()
+            job.state = "failed"
+        finally:
+            job.finished = time.time()
+            with self._lock:
+                self._active.pop(job.key, None)
+
+    def get(self, job_id: str) -> Optional[SolveJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job: SolveJob) -> None:
+        """Arrête la tâche pour tout le monde ; en cours, la meilleure solution trouvée est gardée"""
+        with self._lock:
+            if job.done:
+                return
+            if job.future is not None and job.future.cancel():
+                # Pas encore commencée : elle ne le sera jamais.
+                job.state = "cancelled"
+                job.finished = time.time()
+                self._active.pop(job.key, None)
+                return
+        job.control.stop()
+
+    def release(self, job: SolveJob) -> None:
+        """La session n'attend plus la tâche ; arrêtée si plus personne ne l'attend"""
+        with self._lock:
+            job.subscribers = max(0, job.subscribers - 1)
+            unwanted = job.subscribers == 0
+        if unwanted:
+            self.cancel(job)
+
+    def pending(self) -> int:
+        """Nombre de tâches en attente ou en cours"""
+        with self._lock:
+            return len(self._active)
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - FINISHED_JOBS_KEPT)]:
+            del self._jobs[job_id]
+
+    def shutdown(self) -> None:
+        """Arrête toutes les tâches et les threads de la file"""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if not job.done]
+        for job in jobs:
+            self.cancel(job)
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,83 @@
+"""Profils de résolution : budget de temps, nombre de workers et portefeuille de recherche."""
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple, Union
+
+from ortools.sat.python import cp_model
+
+
+def _available_workers(cap: int) -> int:
+    return max(1, min(os.cpu_count() or 1, cap))
+
+
+@dataclass(frozen=True)
+class SolveProfile:
+    """Paramètres du solveur CP-SAT pour un compromis vitesse / qualité"""
+    name: str
+    label: str
+    max_time_in_seconds: float
+    num_workers: int
+    stop_after_first_solution: bool = False
+    # Sous-solveurs lancés en parallèle ; vide = portefeuille par défaut de CP-SAT.
+    subsolvers: Tuple[str, ...] = ()
+
+    def apply(self, solver: cp_model.CpSolver) -> None:
+        """Applique le profil aux paramètres du solveur"""
+        solver.parameters.max_time_in_seconds = self.max_time_in_seconds
+        solver.parameters.num_workers = self.num_workers
+        solver.parameters.stop_after_first_solution = self.stop_after_first_solution
+        if self.subsolvers:
+            solver.parameters.subsolvers.extend(self.subsolvers)
+
+    def search_key(self) -> Dict[str, Any]:
+        """Ce qui, dans le profil, peut changer le planning obtenu
+
+        Le nombre de workers dépend de la machine et de l'appelant (ligne de
+        commande, lot, file de l'application) : il n'en fait pas partie.
+        """
+        return {"max_time_in_seconds": self.max_time_in_seconds,
+                "stop_after_first_solution": self.stop_after_first_solution,
+                "subsolvers": list(self.subsolvers)}
+
+    def describe(self) -> str:
+        """Résumé lisible du profil"""
+        portfolio = ", ".join(self.subsolvers) if self.subsolvers else "portefeuille par défaut"
+        first = " ; arrêt à la première solution" if self.stop_after_first_solution else ""
+        return (f"{self.max_time_in_seconds:g} s max, {self.num_workers} worker(s), "
+                f"{portfolio}{first}")
+
+
+PROFILES: Dict[str, SolveProfile] = {
+    "fast": SolveProfile(
+        name="fast",
+        label="Rapide",
+        max_time_in_seconds=10.0,
+        num_workers=_available_workers(4),
+        stop_after_first_solution=True,
+        subsolvers=("default_lp", "no_lp", "quick_restart", "quick_restart_no_lp"),
+    ),
+    "balanced": SolveProfile(
+        name="balanced",
+        label="Équilibré",
+        max_time_in_seconds=30.0,
+        num_workers=_available_workers(8),
+    ),
+    "thorough": SolveProfile(
+        name="thorough",
+        label="Approfondi",
+        max_time_in_seconds=120.0,
+        num_workers=_available_workers(16),
+    ),
+}
+DEFAULT_PROFILE = "balanced"
+
+
+def get_profile(profile: Optional[Union[str, SolveProfile]] = None) -> SolveProfile:
+    """Renvoie le profil demandé (par nom ou déjà construit), ou le profil par défaut"""
+    if isinstance(profile, SolveProfile):
+        return profile
+    name = profile or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Profil de résolution inconnu : {name} "
+                         f"(disponibles : {', '.join(PROFILES)})")
+    return PROFILES[name]
@@ -0,0 +1,96 @@
+"""Mesures de la construction du modèle (par bloc de règles) et de la résolution."""
+import re
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+from ortools.sat.python import cp_model
+
+
+@dataclass(frozen=True)
+class BlockStats:
+    """Ce qu'un bloc de contraintes a ajouté au modèle"""
+    name: str
+    build_time: float
+    variables: int
+    constraints: int
+    linear_constraints: int
+    enforcement_literals: int
+
+
+@dataclass(frozen=True)
+class SolverStats:
+    """Statistiques de la résolution"""
+    wall_time: float
+    presolve_time: Optional[float]
+    num_branches: int
+    num_conflicts: int
+    num_booleans: int
+    deterministic_time: float
+    response_stats: str
+
+
+def _is_linear(constraint) -> bool:
+    has_linear = getattr(constraint, "has_linear", None)
+    return has_linear() if callable(has_linear) else constraint.HasField("linear")
+
+
+class BuildProfiler:
+    """Enregistre temps de construction et taille du modèle ajoutés par chaque bloc"""
+
+    def __init__(self, model: cp_model.CpModel) -> None:
+        self.model = model
+        self.blocks: List[BlockStats] = []
+
+    @contextmanager
+    def block(self, name: str) -> Iterator[None]:
+        proto = self.model.proto
+        first_variable = len(proto.variables)
+        first_constraint = len(proto.constraints)
+        start = time.perf_counter()
+        yield
+        build_time = time.perf_counter() - start
+        added = [proto.constraints[i] for i in range(first_constraint, len(proto.constraints))]
+        self.blocks.append(BlockStats(
+            name=name,
+            build_time=build_time,
+            variables=len(proto.variables) - first_variable,
+            constraints=len(added),
+            linear_constraints=sum(1 for c in added if _is_linear(c)),
+            enforcement_literals=sum(len(c.enforcement_literal) for c in added),
+        ))
+
+
+def block_context(profiler: Optional[BuildProfiler], name: str):
+    """Contexte de mesure d'un bloc, sans effet si aucun profileur n'est actif"""
+    return profiler.block(name) if profiler is not None else nullcontext()
+
+
+def enable_solve_log(solver: cp_model.CpSolver) -> None:
+    """Garde le journal du solveur dans la réponse, pour en extraire le temps de presolve"""
+    solver.parameters.log_search_progress = True
+    solver.parameters.log_to_stdout = False
+    solver.parameters.log_to_response = True
+
+
+def _presolve_time(log: str) -> Optional[float]:
+    # "Starting presolve at 0.01s" ... "Starting search at 0.26s with 1 workers."
+    presolve = re.search(r"Starting presolve at ([\d.]+)s", log)
+    search = re.search(r"Starting search at ([\d.]+)s", log)
+    if presolve and search:
+        return float(search.group(1)) - float(presolve.group(1))
+    return None
+
+
+def solver_stats(solver: cp_model.CpSolver) -> SolverStats:
+    """Statistiques de la dernière résolution"""
+    return SolverStats(
+        wall_time=solver.wall_time,
+        presolve_time=_presolve_time(solver.response_proto.solve_log),
+        num_branches=solver.num_branches,
+        num_conflicts=solver.num_conflicts,
+        num_booleans=solver.num_booleans,
+        deterministic_time=solver.deterministic_time,
+        response_stats=solver.response_stats(),
+    )
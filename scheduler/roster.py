@@ -0,0 +1,51 @@
+"""Équipe à planifier : employés, équipe de rattachement et rôles."""
+from typing import Any, Dict, List, Union
+
+from .availability import normalize_unavailability
+from .config import role_dict
+
+# nom -> {"team": équipe, "roles": [rôles]}, plus "unavailable" pour les
+# employés qui ne sont pas toujours là (voir availability.py)
+Employees = Dict[str, Dict[str, Any]]
+
+
+def infer_team(roles: List[str]) -> str:
+    """Retrouve l'équipe d'un employé enregistré sans équipe, d'après ses rôles propres à une équipe"""
+    shared = set.intersection(*(set(team_roles) for team_roles in role_dict.values()))
+    for team, team_roles in role_dict.items():
+        if set(roles) & (set(team_roles) - shared):
+            return team
+    raise ValueError(f"Impossible de déduire l'équipe à partir des rôles {roles}")
+
+
+def normalize_employees(employees: Dict[str, Union[List[str], Dict[str, Any]]]) -> Employees:
+    """Met la liste des employés au format {"team", "roles"} (plus "unavailable" s'il y a lieu)
+
+    L'ancien format (nom -> liste de rôles) est accepté : l'équipe est alors
+    déduite des rôles.
+    """
+    normalized = {}
+    for e, entry in employees.items():
+        if isinstance(entry, dict):
+            team = entry.get("team") or infer_team(entry.get("roles", []))
+            employee_roles = entry.get("roles") or role_dict.get(team, [])
+        else:
+            employee_roles = entry
+            team = infer_team(employee_roles)
+        if team not in role_dict:
+            raise ValueError(f"Équipe inconnue pour {e} : {team} "
+                             f"(disponibles : {', '.join(role_dict)})")
+        normalized[e] = {"team": team, "roles": list(employee_roles)}
+        if isinstance(entry, dict) and entry.get("unavailable"):
+            unavailable = normalize_unavailability(entry["unavailable"])
+            if unavailable:
+                normalized[e]["unavailable"] = unavailable
+    return normalized
+
+
+def team_index(employees: Employees) -> Dict[str, List[str]]:
+    """Équipe -> membres, pour toutes les équipes connues (éventuellement vides)"""
+    teams = {team: [] for team in role_dict}
+    for e, entry in employees.items():
+        teams[entry["team"]].append(e)
+    return teams
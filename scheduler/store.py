@@ -0,0 +1,175 @@
+"""Stockage sur disque des équipes, des règles et des plannings résolus (SQLite).
+
+Tout est rangé par empreinte du contenu : une équipe et une configuration de
+règles par leur forme canonique, un planning par la clé de sa demande (voir
+`engine.request_key`). Retrouver une semaine déjà résolue est une lecture, pas
+une résolution, et la base est partagée par toutes les sessions (et tous les
+processus) qui utilisent le même fichier.
+
+Les grilles sont gardées sous forme compacte : codes de rôle sur un octet,
+compressés, et masque des créneaux ouverts en bits.
+"""
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+from ortools.sat.python import cp_model_helper
+
+from .config import days, normalize_rules, shifts
+from .diagnosis import Conflict
+from .engine import ScheduleResult, canonical_employees
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rosters (
+    hash TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rule_configs (
+    hash TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS schedules (
+    key TEXT PRIMARY KEY,
+    roster TEXT NOT NULL REFERENCES rosters (hash),
+    rules TEXT NOT NULL REFERENCES rule_configs (hash),
+    status INTEGER NOT NULL,
+    status_name TEXT NOT NULL,
+    wall_time REAL NOT NULL,
+    profile TEXT NOT NULL,
+    employees TEXT NOT NULL,
+    grid BLOB,
+    open_mask BLOB NOT NULL,
+    extra TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS schedules_created ON schedules (created);
+"""
+
+
+def content_hash(data: Any) -> str:
+    """Empreinte d'une donnée JSON"""
+    payload = json.dumps(data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _pack(result: ScheduleResult) -> Dict[str, Any]:
+    grid = None
+    if result.grid is not None:
+        grid = zlib.compress(np.ascontiguousarray(result.grid, dtype=np.int8).tobytes())
+    # Pas de masque (résultat sans planning) : blob vide.
+    packed_mask = b"" if result.open_mask is None else np.packbits(result.open_mask).tobytes()
+    extra = {"stability": result.stability,
+             "reused_employees": result.reused_employees,
+             "changed_cells": result.changed_cells,
+             "violations": result.violations,
+             "symmetric_employees": result.symmetric_employees,
+             "conflicts": [[list(c.rules), c.reason] for c in result.conflicts]
+             if result.conflicts is not None else None}
+    return {"status": int(result.status), "status_name": result.status_name,
+            "wall_time": result.wall_time, "profile": result.profile,
+            "employees": json.dumps(result.employees, ensure_ascii=False),
+            "grid": grid, "open_mask": packed_mask,
+            "extra": json.dumps(extra, ensure_ascii=False)}
+
+
+def _unpack(row: sqlite3.Row) -> ScheduleResult:
+    employees = tuple(json.loads(row["employees"]))
+    shape = (len(employees), len(days), len(shifts))
+    grid = None
+    if row["grid"] is not None:
+        grid = np.frombuffer(zlib.decompress(row["grid"]), dtype=np.int8).reshape(shape)
+    open_mask = None
+    if row["open_mask"]:
+        open_mask = np.unpackbits(np.frombuffer(row["open_mask"], dtype=np.uint8),
+                                  count=int(np.prod(shape))).astype(bool).reshape(shape)
+        open_mask.setflags(write=False)
+    extra = json.loads(row["extra"])
+    conflicts = extra.pop("conflicts")
+    if conflicts is not None:
+        conflicts = tuple(Conflict(tuple(rules), reason) for rules, reason in conflicts)
+    return ScheduleResult(status=cp_model_helper.CpSolverStatus(row["status"]), status_name=row["status_name"],
+                          wall_time=row["wall_time"], profile=row["profile"],
+                          employees=employees, grid=grid, open_mask=open_mask,
+                          conflicts=conflicts, **extra)
+
+
+class ScheduleStore:
+    """Base SQLite des équipes, règles et plannings ; utilisable depuis plusieurs threads"""
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    def _connect(self) -> "closing[sqlite3.Connection]":
+        # Une connexion par opération : SQLite sérialise les écritures entre
+        # threads et entre processus.
+        db = sqlite3.connect(self.path, timeout=30)
+        db.row_factory = sqlite3.Row
+        return closing(db)
+
+    def save_roster(self, employees: Dict[str, Any]) -> str:
+        """Enregistre une équipe ; renvoie son empreinte"""
+        employees = canonical_employees(employees)
+        key = content_hash(employees)
+        with self._connect() as db, db:
+            db.execute("INSERT OR IGNORE INTO rosters VALUES (?, ?, ?)",
+                       (key, json.dumps(employees, ensure_ascii=False), time.time()))
+        return key
+
+    def load_roster(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as db:
+            row = db.execute("SELECT data FROM rosters WHERE hash = ?", (key,)).fetchone()
+        return json.loads(row["data"]) if row is not None else None
+
+    def save_rules(self, rules: Optional[Dict[str, bool]] = None) -> str:
+        """Enregistre une configuration de règles ; renvoie son empreinte"""
+        rules = normalize_rules(rules)
+        key = content_hash(rules)
+        with self._connect() as db, db:
+            db.execute("INSERT OR IGNORE INTO rule_configs VALUES (?, ?)",
+                       (key, json.dumps(rules, sort_keys=True)))
+        return key
+
+    def load_rules(self, key: str) -> Optional[Dict[str, bool]]:
+        with self._connect() as db:
+            row = db.execute("SELECT data FROM rule_configs WHERE hash = ?", (key,)).fetchone()
+        return json.loads(row["data"]) if row is not None else None
+
+    def get(self, key: str) -> Optional[ScheduleResult]:
+        """Le planning enregistré pour cette clé de demande, s'il existe"""
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM schedules WHERE key = ?", (key,)).fetchone()
+        return _unpack(row) if row is not None else None
+
+    def put(self, key: str, result: ScheduleResult, employees: Dict[str, Any],
+            rules: Optional[Dict[str, bool]] = None) -> None:
+        """Enregistre un planning, avec l'équipe et les règles de la demande"""
+        roster, rules_hash = self.save_roster(employees), self.save_rules(rules)
+        row = _pack(result)
+        with self._connect() as db, db:
+            db.execute("INSERT OR REPLACE INTO schedules VALUES "
+                       "(:key, :roster, :rules, :status, :status_name, :wall_time, :profile, "
+                       ":employees, :grid, :open_mask, :extra, :created)",
+                       {**row, "key": key, "roster": roster, "rules": rules_hash,
+                        "created": time.time()})
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Derniers plannings enregistrés, du plus récent au plus ancien"""
+        with self._connect() as db:
+            rows = db.execute("SELECT key, roster, rules, status_name, profile, wall_time, "
+                              "employees, created FROM schedules ORDER BY created DESC LIMIT ?",
+                              (limit,)).fetchall()
+        return [{**dict(row), "employees": len(json.loads(row["employees"]))} for row in rows]
+
+    def __len__(self) -> int:
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM schedules").fetchone()[0]
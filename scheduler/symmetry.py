@@ -0,0 +1,78 @@
+"""Bris de symétrie : les agents interchangeables d'une squad sont ordonnés.
+
+Deux membres d'une squad avec les mêmes rôles et les mêmes disponibilités (par
+exemple Facturation1 à Facturation4) sont interchangeables : échanger leurs
+plannings donne une autre solution, de même coût. Le solveur peut alors
+explorer chaque planning sous toutes ses permutations, ce qui coûte surtout
+pour prouver l'optimalité ou l'impossibilité. On impose que le vecteur
+d'affectation de chacun soit lexicographiquement supérieur ou égal à celui du
+suivant : une seule permutation de chaque planning reste possible.
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from .engine import ScheduleModel, ScheduleResult
+from .history import History, carried_counts
+
+
+def interchangeable_groups(sm: ScheduleModel, history: Optional[History] = None,
+                           previous: Optional[ScheduleResult] = None,
+                           stability: str = "hint") -> List[List[str]]:
+    """Groupes (d'au moins deux) d'employés interchangeables dans le modèle
+
+    Même squad, mêmes rôles, mêmes créneaux travaillés ; avec `history`, mêmes
+    compteurs reportés, et avec `previous` en mode "soft" ou "fixed", même planning
+    précédent : tout ce qui distingue un employé dans les contraintes ou
+    l'objectif. En mode "hint", le planning précédent n'est qu'un point de départ.
+    """
+    carried = carried_counts(history, sm.employees) if history is not None else {}
+    previous_pos: Dict[str, int] = {}
+    if previous is not None and stability != "hint":
+        previous_pos = {e: i for i, e in enumerate(previous.employees)}
+    groups: Dict[Tuple[Any, ...], List[str]] = {}
+    for team, members in sm.teams.items():
+        for e in members:
+            previous_row = None
+            if e in previous_pos:
+                previous_row = previous.grid[previous_pos[e]].tobytes()
+            signature = (team, tuple(sm.schedule[e]), sm.available[e].tobytes(),
+                         json.dumps(carried.get(e), sort_keys=True), previous_row)
+            groups.setdefault(signature, []).append(e)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+def add_lex_greater_equal(sm: ScheduleModel, first: List[Any], second: List[Any], name: str) -> None:
+    """Impose `first` >= `second` dans l'ordre lexicographique (vecteurs de booléens)
+
+    `equal` vaut vrai tant que les deux vecteurs sont égaux jusque-là : à cette
+    position, `second` ne peut alors valoir 1 que si `first` vaut 1.
+    """
+    model = sm.model
+    equal = []
+    for i, (x, y) in enumerate(zip(first, second)):
+        prefix = [~literal for literal in equal]
+        model.add_bool_or(prefix + [~y, x])
+        if i == len(first) - 1:
+            break
+        # Égaux jusqu'ici et sur cette position : encore égaux ensuite.
+        next_equal = model.new_bool_var(f"lex_{name}_{i}")
+        model.add_bool_or(prefix + [next_equal, x])
+        model.add_bool_or(prefix + [next_equal, ~y])
+        equal = [next_equal]
+
+
+def add_symmetry_breaking(sm: ScheduleModel, history: Optional[History] = None,
+                          previous: Optional[ScheduleResult] = None, stability: str = "hint") -> int:
+    """Ordonne les plannings des employés interchangeables ; renvoie le nombre d'employés concernés
+
+    Les membres d'un groupe sont pris dans l'ordre de la liste des employés ; en
+    mode "soft" ou "fixed", les groupes tiennent compte du planning précédent
+    (voir `interchangeable_groups`) et il reste une solution admissible.
+    """
+    ordered = 0
+    for members in interchangeable_groups(sm, history, previous, stability):
+        for a, b in zip(members, members[1:]):
+            add_lex_greater_equal(sm, sm.employee_index[a][0], sm.employee_index[b][0], f"{a}_{b}")
+        ordered += len(members)
+    return ordered
+
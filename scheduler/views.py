@@ -0,0 +1,81 @@
+"""Tableaux d'affichage dérivés de la grille d'un résultat (employé x jour x créneau)."""
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from .config import days, roles, shifts
+from .engine import ScheduleResult
+
+
+def _label_lookup(role_labels: Optional[Dict[str, str]], free_label: str) -> np.ndarray:
+    # Libellé associé à chaque code de rôle (code 0 : créneau travaillé sans rôle).
+    role_labels = role_labels or {}
+    return np.array([free_label] + [role_labels.get(r, r) for r in roles], dtype=object)
+
+
+def _sorted_employees(result: ScheduleResult) -> np.ndarray:
+    return np.argsort(np.array(result.employees, dtype=object), kind="stable")
+
+
+def label_grid(result: ScheduleResult, role_labels: Optional[Dict[str, str]] = None,
+               free_label: str = "") -> np.ndarray:
+    """Libellé de chaque case : rôle tenu, `free_label` si le créneau est travaillé sans rôle, None sinon"""
+    labels = _label_lookup(role_labels, free_label)[result.grid]
+    labels[~result.open_mask] = None
+    return labels
+
+
+def global_table(result: ScheduleResult, role_labels: Optional[Dict[str, str]] = None,
+                 free_label: str = "") -> pd.DataFrame:
+    """Planning global : une ligne par jour et créneau travaillé, une colonne par employé"""
+    order = _sorted_employees(result)
+    labels = label_grid(result, role_labels, free_label)[order]
+    cells = labels.transpose(1, 2, 0).reshape(len(days) * len(shifts), len(order))
+    open_rows = result.open_mask.any(axis=0).reshape(-1)
+    index = pd.MultiIndex.from_product([days, shifts], names=["day", "shift"])
+    table = pd.DataFrame(cells, index=index,
+                         columns=pd.Index(np.array(result.employees)[order], name="employee"))
+    return table[open_rows].reset_index()
+
+
+def daily_tables(result: ScheduleResult, role_labels: Optional[Dict[str, str]] = None,
+                 free_label: str = "") -> Dict[str, pd.DataFrame]:
+    """Planning par jour : une ligne par employé, une colonne par créneau"""
+    order = _sorted_employees(result)
+    labels = label_grid(result, role_labels, free_label)[order]
+    names = np.array(result.employees)[order]
+    tables = {}
+    for d_idx, d in enumerate(days):
+        table = pd.DataFrame(labels[:, d_idx, :], columns=shifts)
+        table.insert(0, "employee", names)
+        tables[d] = table
+    return tables
+
+
+def role_counts(result: ScheduleResult, role_labels: Optional[Dict[str, str]] = None,
+                free_label: str = "") -> pd.DataFrame:
+    """Nombre de créneaux travaillés par employé et par libellé"""
+    order = _sorted_employees(result)
+    lookup = _label_lookup(role_labels, free_label)
+    # Les créneaux non travaillés reçoivent un code hors de la table pour ne pas être comptés.
+    codes = np.where(result.open_mask, result.grid, len(lookup))[order]
+    per_code = (codes.reshape(len(order), len(days) * len(shifts), 1) == np.arange(len(lookup))).sum(axis=1)
+    counts = {}
+    for code, label in enumerate(lookup):
+        counts[label] = counts.get(label, 0) + per_code[:, code]
+    table = pd.DataFrame({label: count for label, count in counts.items() if count.any()})
+    table.insert(0, "employee", np.array(result.employees)[order])
+    return table
+
+
+def assignment_table(result: ScheduleResult) -> pd.DataFrame:
+    """Une ligne par employé, jour et créneau travaillé, avec le rôle tenu (vide si aucun)"""
+    e_idx, d_idx, s_idx = np.nonzero(result.open_mask)
+    names = np.array([""] + list(roles), dtype=object)
+    return pd.DataFrame({
+        "employee": np.array(result.employees, dtype=object)[e_idx],
+        "day": np.array(days, dtype=object)[d_idx],
+        "shift": np.array(shifts, dtype=object)[s_idx],
+        "role": names[result.grid[e_idx, d_idx, s_idx]],
+    })
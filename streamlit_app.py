@@ -1,15 +1,23 @@
 import streamlit as st
 import pandas as pd
+import copy
 import json
-from ortools.sat.python import cp_model
+import os
 from streamlit_local_storage import LocalStorage
 from typing import Dict, Any, Optional
 
+import scheduler
+from scheduler import role_dict, views
+
 # Initialiser le module de stockage local
 local_storage = LocalStorage()
 
 # Clé pour le stockage des employés
 EMPLOYEES_KEY = "employees"
+# Clé pour l'historique des semaines validées
+HISTORY_KEY = "history"
+# Base des équipes et des plannings résolus, partagée par tous les utilisateurs
+STORE_PATH = os.environ.get("SCHEDULER_STORE", "plannings.sqlite")
 
 # Fonction pour sauvegarder dans localStorage et session_state
 def save_to_local_storage(key: str, value: Any) -> None:
@@ -25,6 +33,8 @@ def initialize_data(initial_data: Optional[Dict] = None) -> Dict:
     """Initialise les données depuis localStorage ou session_state, ou utilise les données par défaut"""
     # Vérifier si les données sont dans session_state
     if EMPLOYEES_KEY in st.session_state and st.session_state[EMPLOYEES_KEY]:
+        # Les anciennes listes (nom -> rôles) sont converties au format avec équipe
+        st.session_state[EMPLOYEES_KEY] = scheduler.normalize_employees(st.session_state[EMPLOYEES_KEY])
         return st.session_state[EMPLOYEES_KEY]
     
     # Si non, essayer de récupérer depuis localStorage
@@ -36,6 +46,7 @@ def initialize_data(initial_data: Optional[Dict] = None) -> Dict:
             employees_data = json.loads(employees_data)
         
         # Mettre dans session_state et retourner
+        employees_data = scheduler.normalize_employees(employees_data)
         st.session_state[EMPLOYEES_KEY] = employees_data
         return employees_data
     
@@ -43,6 +54,22 @@ def initialize_data(initial_data: Optional[Dict] = None) -> Dict:
     st.session_state[EMPLOYEES_KEY] = initial_data or {}
     return st.session_state[EMPLOYEES_KEY]
 
+def load_history() -> scheduler.History:
+    """Historique des semaines validées, depuis session_state ou localStorage"""
+    if HISTORY_KEY not in st.session_state:
+        history_data = local_storage.getItem(HISTORY_KEY)
+        if isinstance(history_data, str):
+            history_data = json.loads(history_data)
+        st.session_state[HISTORY_KEY] = history_data or {}
+    return st.session_state[HISTORY_KEY]
+
+@st.cache_resource
+def open_store(path: str) -> scheduler.ScheduleStore:
+    """Ouvre la base une fois par processus : un planning déjà résolu y est relu au lieu d'être recalculé"""
+    return scheduler.set_store(path)
+
+store = open_store(STORE_PATH)
+
 
 
 
@@ -54,17 +81,11 @@ st.write(
 st.text_input("Quel prénom ?", key="name", placeholder="Charlotte")
 option = st.selectbox(
     'Quel équipe ?',
-    ["Client", "Facturation"])
+    list(role_dict))
 person_name = st.session_state.name
 if st.session_state.name:
     st.write(f"Nom d'affichage: {person_name}")
 
-model = cp_model.CpModel()
-
-# Dict pour les rôles de chaque équipe:
-role_dict = {"Client": ["Téléphone", "IC_Client", "Slack/tâches"],
-             "Facturation": ["Téléphone", "IC_Factu", "Slack/tâches"]}
-
 # Initialiser les données si ce n'est pas déjà fait
 # Si aucune donnée n'est présente dans st.session_state, utiliser un dictionnaire vide par défaut
 employees = initialize_data({})
@@ -74,7 +95,7 @@ left, right = st.columns(2)
 if left.button("Ajouter le collaborateur", icon="➕", use_container_width=True):
     if st.session_state.name:
         left.markdown(f"{st.session_state.name} ({option}) ajouté !")
-        employees[person_name] = role_dict[option]
+        employees[person_name] = {"team": option, "roles": role_dict[option]}
         # Save to localStorage instead of JSON file
         st.session_state['employees'] = employees
         save_to_local_storage('employees', employees)
@@ -94,422 +115,303 @@ if right.button("Enlever le collaborateur", icon="➖", use_container_width=True
 st.write("Liste des employés: ")
 if employees:
     # Créer un DataFrame seulement si le dictionnaire n'est pas vide
-    employees_df = pd.DataFrame([{"Employee": k, "Roles": employees[k]} 
+    employees_df = pd.DataFrame([{"Employee": k, "Team": employees[k]["team"], "Roles": employees[k]["roles"]}
                                for k in employees]).set_index("Employee", drop=True)
     st.write(employees_df)
 else:
     st.info("Aucun employé n'a été ajouté. Utilisez le formulaire ci-dessus pour ajouter des employés ou importez des données.")
 
-# Les horaires sont de 8h30 à 18h le lundi, mardi, mercredi et jeudi ; 8h30 à 17h le vendredi.
-days = ["Monday",
-        "Tuesday",
-        "Wednesday",
-        "Thursday",
-        "Friday"]
-
-# Le planning fonctionne avec des créneaux de 30 minutes.
-shifts = [f"{t//60:02}:{t%60:02}" for t in range(510, 1080, 30)]
-roles = set(role_dict["Client"] + role_dict["Facturation"])
-
-schedule = {e:
-            {r:
-             {d:
-              {s: model.new_bool_var(f"schedule_{e}_{r}_{d}_{s}")
-               for s in shifts}
-              for d in days}
-             for r in roles}
-            for e in employees}
-
-# Les contraintes !
+# Les plannings résolus par tous les utilisateurs : reprendre une équipe déjà planifiée.
+saved = store.recent()
+if saved:
+    with st.expander("Plannings déjà résolus"):
+        saved_df = pd.DataFrame(saved)
+        saved_df["created"] = pd.to_datetime(saved_df["created"], unit="s").dt.strftime("%d/%m/%Y %H:%M")
+        st.write(saved_df[["created", "employees", "status_name", "profile"]]
+                 .rename(columns={"created": "Date", "employees": "Employés",
+                                  "status_name": "Statut", "profile": "Profil"}))
+        chosen = st.selectbox("Planning", range(len(saved)),
+                              format_func=lambda i: f"{saved_df['created'][i]} — {saved[i]['employees']} employés")
+        if st.button("Reprendre cette équipe"):
+            save_to_local_storage(EMPLOYEES_KEY, store.load_roster(saved[chosen]["roster"]))
+            st.rerun()
+
+# Absences et temps partiels : une période d'indisponibilité par employé et par jour.
+# Un jour férié, c'est tout le monde absent : le service est alors fermé.
+def availability_label(spec: Any) -> str:
+    """Libellé d'une période d'indisponibilité (None : présent)"""
+    if spec is None:
+        return "Présent"
+    if isinstance(spec, str):
+        return {"morning": "Absent le matin", "afternoon": "Absent l'après-midi", "all": "Absent"}[spec]
+    # Les créneaux précis (importés d'un fichier) sont affichés tels quels.
+    return f"Absent {', '.join(spec)}"
 
-# Les heures non travaillées dans la journée sont
-# - tous les jours entre 12h30 et 13h30
-# - le lundi entre 12h et 12h30
-# - le mercredi de 17h à 18h
-# - le jeudi de 12h à 12h30.
-st.write("Liste des contraintes:")
-for e in employees:
-    for r in roles:
-        for d in days:
-            for s in shifts:
-                if s in ["12:30", "13:00"]:
-                    model.add(schedule[e][r][d][s] == 0)
-                if d in ["Monday", "Thursday"] and s == ["12:00"]:
-                    model.add(schedule[e][r][d][s] == 0)
-                if d == "Wednesday" and s in ["17:00", "17:30"]:
-                    model.add(schedule[e][r][d][s] == 0)
-                if d == "Friday" and s in ["17:00", "17:30"]:
-                    model.add(schedule[e][r][d][s] == 0)
-
-# Les employés ne peuvent pas faire un rôle qu'on ne leur a pas attribué:
-for e in employees:
-    for r in roles:
-        for d in days:
-            for s in shifts:
-                if r not in employees[e]:
-                    model.add(schedule[e][r][d][s] == 0)
-
-# Les employés ne peuvent pas faire deux rôles en même temps
-for e in employees:
-    for d in days:
-        for s in shifts:
-            model.add(sum(schedule[e][r][d][s] for r in roles) <= 1)
-
-
-def get_shifts_for_day(d):
-    day_shifts = [s for s in shifts if s not in ["12:30", "13:00"]]
-    if d in ["Wednesday", "Friday"]:
-        day_shifts = day_shifts[:-2]
-    elif d in ["Monday", "Thursday"]:
-        day_shifts = [s for s in day_shifts if s != "12:00"]
-    return day_shifts
-
-# Il doit toujours y avoir 4 personnes (les 2 squads confondues)
-# au téléphone entre 9h et 12h et entre 14h et 18h
-# (sauf le mercredi et le vendredi : jusqu'à 17h)
-# Le vendredi : 5 personnes au téléphone
-
-
-if st.checkbox("Il doit toujours y avoir 4 personnes au téléphone aux heures d'ouverture du standard", value=True):
-    for d in days:
-        for s in get_shifts_for_day(d):
-            if s in ['09:00', '09:30', '10:00', '10:30', '11:00', '11:30']:
-                model.add(sum(schedule[e]["Téléphone"][d][s]
-                          for e in employees) == 4)
-            elif s in ['14:00', '14:30', '15:00', '15:30', '16:00', '16:30', '17:00', '17:30']:
-                if d != "Friday":
-                    model.add(sum(schedule[e]["Téléphone"][d][s]
-                              for e in employees) == 4)
-                elif s in ['15:30', '16:00', '16:30', '17:00', '17:30']:
-                    model.add(sum(schedule[e]["Téléphone"][d][s]
-                              for e in employees) == 5)
-                else:
-                    model.add(sum(schedule[e]["Téléphone"][d][s]
-                              for e in employees) == 4)
-            elif s in ['13:30', '08:30']:
-                model.add(sum(schedule[e]["Téléphone"][d][s]
-                          for e in employees) == 0)
-
-# Dans chaque squad, il doit toujours y avoir quelqu'un sur Intercom 
-if st.checkbox("Dans chaque squad, il doit toujours y avoir quelqu'un sur Intercom", value=True):
-    for d in days:
-        day_shifts = get_shifts_for_day(d)
-        # print(d, day_shift)
-        for s in day_shifts:
-            model.add(sum(schedule[e]["IC_Client"][d][s]
-                      for e in employees if "Client" in e) == 1)
-            model.add(sum(schedule[e]["IC_Factu"][d][s]
-                      for e in employees if "Facturation" in e) == 1)
-
-
-# Pour chaque squad, il doit toujours y avoir maximum 1 personne sur Slack/tâches.
-if st.checkbox("Pour chaque squad, il doit toujours y avoir maximum 1 personne sur slack", value=True):
-    for d in days:
-        day_shifts = get_shifts_for_day(d)
-        # print(d, day_shift)
-        for s in day_shifts:
-            model.add(sum(schedule[e]["Slack/tâches"][d][s] 
-                          for e in employees
-                          if 'Facturation' in e) <= 1)
-            model.add(sum(schedule[e]["Slack/tâches"][d][s] 
-                          for e in employees
-                          if 'Client' in e) <= 1)
-            
-# Pour chaque squad, chaque personne doit avoir au moins 1 créneau Slack/tâches
-has_Slack_tasks = {}
-if st.checkbox("Pour chaque squad, chaque personne doit avoir au moins 1 créneau Slack/tâches", value=True):
-    for e in employees:
-        for d in days:
-            day_shifts = get_shifts_for_day(d)
-            has_Slack_tasks[e] = {
-                d: {}
-            }
-            for s in day_shifts:
-                has_Slack_tasks[e][d][s] = schedule[e]["Slack/tâches"][d][s]
-                # La contrainte principale : chaque personne doit avoir au moins 1 créneau Slack/tâches
-            model.add(
-                sum(has_Slack_tasks[e][d][s] for s in day_shifts) > 0
-            )
-        
 
-# Chaque personne doit avoir une demi-journée sans téléphone par semaine.
-# Cette demi-journée ne peut pas être le vendredi après-midi.
-
-# Demi-journée sans téléphone (matin : avant 12h00, après-midi : après 12h00)
-morning_shifts = [s for s in shifts if s in ['09:00', '09:30', '10:00',
-                                             '10:30', '11:00', '11:30']]
-afternoon_shifts = [s for s in shifts if s in ['13:30', '14:00', '14:30',
-                                               '15:00', '15:30', '16:00',
-                                               '16:30', '17:00', '17:30']]
-has_morning_without_phone = {}
-has_afternoon_without_phone = {}
-if nophone := st.checkbox("Chaque personne doit avoir une demi-journée sans téléphone par semaine. Cette demi-journée ne peut pas être le vendredi après-midi.", value=True):
-
-    # Itération sur chaque employé et chaque jour sauf vendredi après-midi
-
-    for e in employees:
-        # Une variable booléenne pour indiquer si une demi-journée sans téléphone est respectée
-        has_morning_without_phone[e] = {
-            d:  model.new_bool_var(f"morning_without_phone_{e}_{d}") for d in days
-        }
-        has_afternoon_without_phone[e] = {
-            d: model.new_bool_var(f"afternoon_without_phone_{e}_{d}") for d in days
-        }
-        for d in days:
-            # Contraintes pour le matin : aucune plage horaire avec téléphone
-            model.add(
-                sum(schedule[e]["Téléphone"][d][s]
-                    for s in get_shifts_for_day(d) if s in morning_shifts) == 0
-            ).only_enforce_if(has_morning_without_phone[e][d])
-            model.add(
-                sum(schedule[e]["Téléphone"][d][s]
-                    for s in get_shifts_for_day(d) if s in morning_shifts) >= 1
-            ).only_enforce_if(~has_morning_without_phone[e][d])
-
-            # Contraintes pour l'après-midi : aucune plage horaire avec téléphone, sauf vendredi
-            if d != "Friday":
-                model.add(
-                    sum(schedule[e]["Téléphone"][d][s]
-                        for s in get_shifts_for_day(d) if s in afternoon_shifts) == 0
-                ).only_enforce_if(has_afternoon_without_phone[e][d])
-                model.add(
-                    sum(schedule[e]["Téléphone"][d][s]
-                        for s in get_shifts_for_day(d) if s in afternoon_shifts) >= 1
-                ).only_enforce_if(~has_afternoon_without_phone[e][d])
-
-        # La contrainte principale : chaque personne doit avoir au moins une demi-journée sans téléphone
-        model.add(
-            sum(has_morning_without_phone[e][d] for d in days) +
-            sum(has_afternoon_without_phone[e][d]
-                for d in days if d != "Friday") >= 1
-        )
-
-# Pour chaque squad, il doit y avoir au moins 2 créneaux Slack/tâches par demi-journée.
-if st.checkbox("Pour chaque squad, il doit y avoir au moins 2 créneaux Slack/tâches par demi-journée", value=True):
-    for d in days:
-
-        model.add(sum(
-            schedule[e]["Slack/tâches"][d][morning_shift] 
-            for e in employees 
-            if 'Facturation' in e
-            for morning_shift in morning_shifts
-        ) >= 4)
-        
-        model.add(sum(
-            schedule[e]["Slack/tâches"][d][morning_shift] 
-            for e in employees 
-            if 'Client' in e
-            for morning_shift in morning_shifts
-        ) >= 4)
-
-
-
-        model.add(sum(
-            schedule[e]["Slack/tâches"][d][afternoon_shift] 
-            for e in employees 
-            if 'Facturation' in e
-            for afternoon_shift in afternoon_shifts
-        ) >= 4)
-
-        model.add(sum(
-            schedule[e]["Slack/tâches"][d][afternoon_shift] 
-            for e in employees 
-            if 'Client' in e
-            for afternoon_shift in afternoon_shifts
-        ) >= 4)
-
-
-
-if st.checkbox("Dans chaque squad, chaque personne doit passer à peu près le même temps au téléphone, sur Intercom, sur Slack/tâches et sur les tâches.", value=True):
-
-    max_nb_shifts = 100
-    # il faut prendre en compte les équipes !
-    total_shifts = {}
-    min_shifts = {}
-    max_shifts = {}
-    for team in ["Facturation", "Client"]:
-        for r in [r for r in role_dict[team]]:
-            # print(team,r)
-            # print(r not in total_shifts)
-            if r not in total_shifts:
-                total_shifts[r] = {}
-            for e in [c for c in employees if team in c]:
-                # print(team,r,e)
-                total_shifts[r][e] = model.new_int_var(
-                    0, max_nb_shifts, f"total_shifts_c_{e}_{r}")
-                # pprint(total_shifts)
-                model.add(total_shifts[r][e] == sum(schedule[e][r][d][s]
-                          for d in days for s in get_shifts_for_day(d)))
-            min_shifts[r] = model.new_int_var(
-                0, max_nb_shifts, f"min_shifts_c_{r}")
-            model.add_min_equality(min_shifts[r], [total_shifts[r][e] for e in [
-                                   c for c in employees if team in c]])
-            max_shifts[r] = model.new_int_var(
-                0, max_nb_shifts, f"max_shifts_c_{r}")
-            model.add_max_equality(max_shifts[r], [total_shifts[r][e] for e in [
-                                   c for c in employees if team in c]])
-            model.add(max_shifts[r] - min_shifts[r] <= 2)
-
-
-if st.checkbox("Pas + de 3 créneaux à la suite pour chaque rôle sauf Téléphone, maximum 4 créneaux.", value=True):
-    continuous_shifts = {}
-    for e in employees:
-        continuous_shifts[e] = {}
-        for d in days:
-            continuous_shifts[e][d] = {}
-            for r in roles:
-                if r != "Téléphone":
-                    continuous_shifts[e][d][r] = {}
-                    for s_idx, s in enumerate([s for s in morning_shifts]):
-                        if s_idx < 4:
-                            model.add(
-                                sum(schedule[e][r][d][s]
-                                    for s in morning_shifts[s_idx:s_idx+4]) <= 2
-                            )
-                    for s_idx, s in enumerate([s for s in afternoon_shifts]):
-                        if s_idx < 5:
-                            model.add(
-                                sum(schedule[e][r][d][s]
-                                    for s in afternoon_shifts[s_idx:s_idx+5]) <= 4
-                            )
-
-if st.checkbox("Organisation du téléphone en 'créneaux' de 1h30 le matin / 2h l'après-midi.", value=nophone, disabled=not nophone):
-    has_morning_early_phone = {}
-    early_morning_shifts = ["09:00", "09:30", "10:00"]
-    late_morning_shifts = ["10:30", "11:00", "11:30"]
-    early_afternoon_shifts_redux = ["14:00", "14:30", "15:00"]
-    late_afternoon_shifts_redux = ["15:30", "16:00", "16:30"]
-    early_afternoon_shifts = ["14:00", "14:30", "15:00", "15:30"]
-    late_afternoon_shifts = ["16:00", "16:30", "17:00", "17:30"]
-    for e in employees:
-        has_morning_early_phone[e] = {
-            d:  model.new_bool_var(f"morning_early_phone_{e}_{d}") for d in days
-        }
-        for d in days:
-            model.add(
-                sum(schedule[e]["Téléphone"][d][s]
-                    for s in early_morning_shifts) == 3
-            ).only_enforce_if(has_morning_early_phone[e][d]).only_enforce_if(~has_morning_without_phone[e][d])
-            model.add(
-                sum(schedule[e]["Téléphone"][d][s]
-                    for s in early_morning_shifts) == 0
-            ).only_enforce_if(~has_morning_early_phone[e][d])
-            model.add(
-                sum(schedule[e]["Téléphone"][d][s]
-                    for s in late_morning_shifts) == 3
-            ).only_enforce_if(~has_morning_early_phone[e][d]).only_enforce_if(~has_morning_without_phone[e][d])
-            model.add(
-                sum(schedule[e]["Téléphone"][d][s]
-                    for s in late_morning_shifts) == 0
-            ).only_enforce_if(has_morning_early_phone[e][d])
-            if d in ["Monday", "Tuesday", "Thursday"]:
-                model.add(
-                    sum(schedule[e]["Téléphone"][d][s]
-                        for s in early_afternoon_shifts) == 4
-                ).only_enforce_if(has_morning_early_phone[e][d]).only_enforce_if(~has_afternoon_without_phone[e][d])
-                model.add(
-                    sum(schedule[e]["Téléphone"][d][s]
-                        for s in early_afternoon_shifts) == 0
-                ).only_enforce_if(~has_morning_early_phone[e][d])
-                model.add(
-                    sum(schedule[e]["Téléphone"][d][s]
-                        for s in late_afternoon_shifts) == 4
-                ).only_enforce_if(~has_morning_early_phone[e][d]).only_enforce_if(~has_afternoon_without_phone[e][d])
-                model.add(
-                    sum(schedule[e]["Téléphone"][d][s]
-                        for s in late_afternoon_shifts) == 0
-                ).only_enforce_if(has_morning_early_phone[e][d])
-            elif d == "Wednesday":
-                model.add(
-                    sum(schedule[e]["Téléphone"][d][s]
-                        for s in early_afternoon_shifts_redux) == 3
-                ).only_enforce_if(has_morning_early_phone[e][d]).only_enforce_if(~has_afternoon_without_phone[e][d])
-                model.add(
-                    sum(schedule[e]["Téléphone"][d][s]
-                        for s in early_afternoon_shifts_redux) == 0
-                ).only_enforce_if(~has_morning_early_phone[e][d])
-                model.add(
-                    sum(schedule[e]["Téléphone"][d][s]
-                        for s in late_afternoon_shifts_redux) == 3
-                ).only_enforce_if(~has_morning_early_phone[e][d]).only_enforce_if(~has_afternoon_without_phone[e][d])
-                model.add(
-                    sum(schedule[e]["Téléphone"][d][s]
-                        for s in late_afternoon_shifts_redux) == 0
-                ).only_enforce_if(has_morning_early_phone[e][d])
-            elif d == "Friday":
-                model.add(
-                    sum(schedule[e]["Téléphone"][d][s]
-                        for s in early_afternoon_shifts_redux) == 3
-                ).only_enforce_if(has_morning_early_phone[e][d]).only_enforce_if(~has_afternoon_without_phone[e][d])
-                model.add(
-                    sum(schedule[e]["Téléphone"][d][s]
-                        for s in early_afternoon_shifts_redux) == 0
-                ).only_enforce_if(~has_morning_early_phone[e][d])
-                model.add(
-                    sum(schedule[e]["Téléphone"][d][s]
-                        for s in late_afternoon_shifts_redux) == 3
-                ).only_enforce_if(~has_morning_early_phone[e][d]).only_enforce_if(~has_afternoon_without_phone[e][d])
-                model.add(
-                    sum(schedule[e]["Téléphone"][d][s]
-                        for s in late_afternoon_shifts_redux) == 0
-                ).only_enforce_if(has_morning_early_phone[e][d])
-
-
-solver = cp_model.CpSolver()
-solver.solve(model)
-status = solver.solve(model)
-print(status)
-if status == 4:
-    st.write("Emploi du temps généré !")
-    data_list = []
-    for e in employees:
-        for d in days:
-            for s in shifts:
-                role = "📞" if solver.value(schedule[e]["Téléphone"][d][s]) == 1 else "✉️" if (solver.value(schedule[e]["IC_Client"][d][s]) == 1 or solver.value(
-                    schedule[e]["IC_Factu"][d][s]) == 1) else "🙋/✅" if solver.value(schedule[e]["Slack/tâches"][d][s]) == 1 else "✅" if s in get_shifts_for_day(d) else None
-                data_list.append(
-                    {"employee": e, "day": d, "shift": s, "role": role})
-    schedule_df = pd.DataFrame(data_list).sort_values(by=["day", "employee"])
-    schedule_dict = {}
-    for day, day_df in schedule_df.groupby(by="day"):
-        shifts_list = []
-        for e, employee_df in day_df.groupby(by="employee"):
-            day_shifts = employee_df["shift"]
-            shift_role = employee_df["role"]
-            shifts_dict = {"employee": e}
-            for i in range(len(day_shifts)):
-                shifts_dict[day_shifts.iloc[i]] = shift_role.iloc[i]
-            shifts_list.append(shifts_dict)
-        schedule_dict[day] = pd.DataFrame(shifts_list)
+if employees:
+    with st.expander("Disponibilités (absences, temps partiels, jours fériés)"):
+        unavailable = {e: employees[e].get("unavailable", {}) for e in employees}
+        specs = [None, "morning", "afternoon", "all"] + [
+            spec for e in employees for spec in unavailable[e].values() if not isinstance(spec, str)]
+        spec_of = {availability_label(spec): spec for spec in specs}
+        availability_df = pd.DataFrame(
+            [{d: availability_label(unavailable[e].get(d)) for d in scheduler.days} for e in employees],
+            index=list(employees))
+        edited_df = st.data_editor(
+            availability_df,
+            column_config={d: st.column_config.SelectboxColumn(d, options=list(spec_of), required=True)
+                           for d in scheduler.days},
+            key="availability_editor")
+        if not edited_df.equals(availability_df):
+            for e in employees:
+                edited = {d: spec_of[edited_df.loc[e, d]] for d in scheduler.days
+                          if spec_of[edited_df.loc[e, d]] is not None}
+                employees[e].pop("unavailable", None)
+                if edited:
+                    employees[e]["unavailable"] = edited
+            save_to_local_storage(EMPLOYEES_KEY, employees)
 
+# Les contraintes !
+st.write("Liste des contraintes:")
+rules = {}
+for rule, label in scheduler.RULES.items():
+    if rule in scheduler.RULE_DEPENDENCIES:
+        required = rules[scheduler.RULE_DEPENDENCIES[rule]]
+        rules[rule] = st.checkbox(label, value=required, disabled=not required)
+    else:
+        rules[rule] = st.checkbox(label, value=True)
+
+# Règles souples : le planning peut les enfreindre, au prix de leur poids par contrainte enfreinte.
+soft_rules = st.multiselect(
+    "Règles à assouplir (préférences plutôt qu'obligations)",
+    [rule for rule in scheduler.RULES if rules[rule]],
+    format_func=lambda rule: scheduler.RULES[rule])
+soft = {rule: st.number_input(f"Poids : {scheduler.RULES[rule]}", min_value=1,
+                              value=scheduler.SOFT_WEIGHTS[rule], key=f"soft_{rule}")
+        for rule in soft_rules}
+
+# Le profil de résolution borne le temps de calcul et fixe le nombre de workers.
+profile_name = st.selectbox(
+    "Profil de résolution",
+    list(scheduler.PROFILES),
+    index=list(scheduler.PROFILES).index(scheduler.DEFAULT_PROFILE),
+    format_func=lambda name: scheduler.PROFILES[name].label)
+profile = scheduler.PROFILES[profile_name]
+st.caption(f"Profil « {profile.label} » : {profile.describe()}")
+
+# Mode instrumenté : où passe le temps de construction et de résolution ?
+instrument = st.checkbox("Mesurer la construction du modèle et la résolution", value=False)
+
+# Grandes équipes : un sous-problème par jour, résolus en parallèle, puis coordination de la semaine.
+decompose = st.checkbox("Résoudre jour par jour en parallèle (grandes équipes)", value=False)
+
+# Même règles, formulées autrement ; l'encodage compact reste expérimental.
+encoding = st.selectbox(
+    "Encodage des règles",
+    list(scheduler.ENCODINGS),
+    format_func=lambda name: scheduler.ENCODINGS[name])
+
+# Agents interchangeables (même squad, mêmes rôles et disponibilités) : une seule
+# permutation de leurs plannings est explorée.
+symmetry = st.checkbox("Ordonner les plannings des agents interchangeables", value=False)
+
+# Équité dans la durée : les compteurs des semaines validées sont reportés sur la semaine.
+stored_history = load_history()
+weeks_recorded = max((entry["weeks"] for entry in stored_history.values()), default=0)
+use_history = st.checkbox(f"Équilibrer avec les semaines précédentes "
+                          f"({weeks_recorded} semaine(s) validée(s))", value=bool(stored_history))
+history = stored_history if use_history else None
+
+# Quand l'équipe change, le planning précédent sert de point de départ.
+stability = st.selectbox(
+    "Quand l'équipe change",
+    list(scheduler.STABILITY_MODES),
+    format_func=lambda mode: scheduler.STABILITY_MODES[mode])
+
+role_emoji = {"Téléphone": "📞", "IC_Client": "✉️", "IC_Factu": "✉️", "Slack/tâches": "🙋/✅"}
+
+
+@st.cache_resource
+def job_queue() -> scheduler.JobQueue:
+    """File des résolutions, partagée par toutes les sessions : le nombre de résolutions simultanées est borné"""
+    return scheduler.JobQueue(int(os.environ.get("SCHEDULER_MAX_SOLVES", scheduler.MAX_CONCURRENT_SOLVES)))
+
+jobs = job_queue()
+
+
+def current_job(options: Dict[str, Any]) -> scheduler.SolveJob:
+    """La tâche de la demande affichée ; celle d'une demande précédente est libérée"""
+    job = st.session_state.get("solve_job")
+    key = scheduler.job_key(employees, rules, profile, **options)
+    if job is None or job.key != key:
+        if job is not None:
+            # Les données ont changé : la recherche précédente n'intéresse plus cette session.
+            jobs.release(job)
+        diagnosis = st.session_state.pop("diagnosis_job", None)
+        if diagnosis is not None:
+            jobs.release(diagnosis)
+        job = jobs.submit(employees, rules, profile, **options)
+        st.session_state["solve_job"] = job
+    return job
+
+
+@st.fragment(run_every=0.5)
+def show_diagnosis_progress(diagnosis: scheduler.SolveJob) -> None:
+    """Suit la recherche des règles en conflit en arrière-plan"""
+    if diagnosis.done:
+        st.rerun()
+    if diagnosis.state == "queued":
+        st.progress(0.0, text="Recherche des règles en conflit : en attente d'un solveur libre…")
+    else:
+        st.progress(diagnosis.progress, text=f"Recherche des règles en conflit depuis "
+                                             f"{diagnosis.elapsed:.0f} s…")
+
+
+def session_previous() -> Optional[scheduler.ScheduleResult]:
+    """Le planning précédent de cette session pour ces règles (voir `remember_result`)"""
+    last = st.session_state.get("last_results", {}).get(scheduler.rules_key(rules))
+    if last is None:
+        return None
+    last_employees, last_previous, last_result = last
+    # Même équipe : même point de départ que la dernière fois, donc même demande.
+    return last_previous if last_employees == employees else last_result
+
+
+def remember_result(previous: Optional[scheduler.ScheduleResult],
+                    result: scheduler.ScheduleResult) -> None:
+    """Garde le dernier planning trouvé par cette session, pour ces règles"""
+    if result.found:
+        st.session_state.setdefault("last_results", {})[scheduler.rules_key(rules)] = (
+            copy.deepcopy(employees), previous, result)
+
+
+@st.fragment(run_every=0.5)
+def show_progress(job: scheduler.SolveJob, show_latest: bool) -> None:
+    """Suit la résolution en arrière-plan ; la page reste utilisable pendant ce temps"""
+    if job.done:
+        # Le résultat est prêt : toute la page est redessinée avec.
+        st.rerun()
+    if job.state == "queued":
+        st.progress(0.0, text=f"En attente d'un solveur libre ({jobs.pending()} résolution(s) "
+                              f"en cours ou en attente)…")
+    else:
+        st.progress(job.progress, text=f"Recherche en cours depuis {job.elapsed:.0f} s "
+                                       f"(au plus {profile.max_time_in_seconds:.0f} s)…")
+    latest = job.latest
+    if show_latest and latest is not None:
+        st.write(f"Solution provisoire trouvée après {latest.wall_time:.1f} s, la recherche continue…")
+        st.write(views.global_table(latest, role_emoji, "✅"))
+    if st.button("Arrêter la recherche", icon="⏹️"):
+        # La meilleure solution trouvée jusque-là est gardée.
+        jobs.cancel(job)
+
+
+# La résolution tourne en arrière-plan et passe par le cache : tant que les
+# employés, les règles et le profil ne changent pas, le planning n'est pas recalculé.
+streaming = st.checkbox("Afficher les solutions au fur et à mesure de la recherche", value=False)
+# Le planning précédent est celui de cette session : celui d'une autre session ne
+# doit pas servir de base en mode "soft" ou "fixed".
+previous = session_previous()
+job = current_job(dict(previous=previous, stability=stability, instrument=instrument,
+                       decompose=decompose, encoding=encoding, history=history, soft=soft,
+                       symmetry=symmetry))
+if not job.done:
+    show_progress(job, streaming)
+    st.stop()
+if job.state == "failed":
+    st.error("La résolution a échoué.")
+    st.code(job.error)
+    st.stop()
+if job.state == "cancelled":
+    # Arrêtée (par cette session ou une autre qui attendait le même planning).
+    st.info("Recherche arrêtée : meilleure solution trouvée avant l'arrêt." if job.result is not None
+            else "Recherche arrêtée avant d'avoir commencé.")
+    if st.button("Relancer la recherche"):
+        st.session_state.pop("solve_job", None)
+        st.rerun()
+    if job.result is None:
+        st.stop()
+result = job.result
+remember_result(previous, result)
+st.caption(f"Statut : {result.status_name} en {result.wall_time:.1f} s (profil « {profile.label} »)")
+if result.found and result.changed_cells is not None:
+    st.caption(f"Repris du planning précédent : {result.reused_employees} collaborateur(s), "
+               f"{result.changed_cells} créneau(x) modifié(s) "
+               f"({scheduler.STABILITY_MODES[result.stability].lower()}).")
+if result.build_report is not None:
+    with st.expander("Profil du modèle et du solveur"):
+        st.write("Construction du modèle, par bloc de règles :")
+        build_df = pd.DataFrame([vars(block) for block in result.build_report]).set_index("name")
+        build_df["label"] = [scheduler.RULES.get(name, "") for name in build_df.index]
+        st.write(build_df)
+        if result.solver_stats is not None:
+            stats = result.solver_stats
+            presolve = f"{stats.presolve_time:.2f} s" if stats.presolve_time is not None else "?"
+            st.write(f"Résolution : {stats.wall_time:.2f} s dont presolve {presolve}, "
+                     f"{stats.num_branches} branches, {stats.num_conflicts} conflits.")
+            st.code(stats.response_stats)
+
+if result.found:
+    if result.optimal:
+        st.write("Emploi du temps généré !")
+    else:
+        st.write("Emploi du temps généré (meilleure solution trouvée dans le temps imparti) !")
+    broken = {scheduler.RULES[rule]: count for rule, count in (result.violations or {}).items() if count}
+    if broken:
+        st.warning("Règles assouplies enfreintes (nombre de contraintes) :")
+        st.write(pd.Series(broken, name="enfreintes"))
+    # Tous les tableaux sont dérivés de la grille (employé x jour x créneau) du résultat.
     st.write("Planning global :")
-    pivot_data = schedule_df.pivot_table(
-        index=['day', 'shift'],
-        columns='employee',
-        values='role',
-        aggfunc='first'
-    ).reset_index()
-    custom_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
-    pivot_data['day'] = pd.Categorical(
-        pivot_data['day'], categories=custom_order, ordered=True)
-    pivot_data = pivot_data.sort_values(by=['day', 'shift'])
-    st.write(pivot_data)
+    st.write(views.global_table(result, role_emoji, "✅"))
 
     st.write("Planning par jour:")
-    for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]:
+    for day, day_df in views.daily_tables(result, role_emoji, "✅").items():
         st.write(day)
-        st.write(schedule_dict[day])
-
-    count_dict_list = []
-    for employee, employee_df in schedule_df.groupby(by="employee"):
-        shift_counts = employee_df["role"].value_counts()
-        count_dict = {"employee": employee}
-        for role, role_count in zip(shift_counts.index, shift_counts.values):
-            count_dict[role] = role_count
-        count_dict_list.append(count_dict)
-    count_df = pd.DataFrame(count_dict_list)
+        st.write(day_df)
+
     st.write("Compte total:")
-    st.write(count_df)
+    st.write(views.role_counts(result, role_emoji, "✅"))
+
+    # La semaine validée s'ajoute à l'historique, pour équilibrer les suivantes.
+    if st.button("Valider ce planning pour la semaine", icon="📅"):
+        stored_history = scheduler.record_week(stored_history, result)
+        save_to_local_storage(HISTORY_KEY, stored_history)
+        # La semaine suivante est planifiée avec l'historique à jour.
+        st.rerun()
 
 else:
     st.write("Pas d'emploi du temps respectant les contraintes 😥")
+    if result.status_name == "INFEASIBLE":
+        # Le pré-contrôle de capacité a pu conclure sans lancer le solveur.
+        conflicts = result.conflicts
+        if not conflicts:
+            # La recherche tourne dans la file, comme une résolution : la page reste utilisable.
+            hard_rules = {rule: active and rule not in soft for rule, active in rules.items()}
+            diagnosis = st.session_state.get("diagnosis_job")
+            wanted_key = scheduler.diagnosis_key(employees, hard_rules, profile)
+            if diagnosis is not None and diagnosis.key != wanted_key:
+                jobs.release(st.session_state.pop("diagnosis_job"))
+                diagnosis = None
+            if diagnosis is None and st.button("Chercher les règles en conflit", icon="🔍"):
+                diagnosis = jobs.submit_diagnosis(employees, hard_rules, profile)
+                st.session_state["diagnosis_job"] = diagnosis
+            if diagnosis is not None and not diagnosis.done:
+                show_diagnosis_progress(diagnosis)
+            elif diagnosis is not None and diagnosis.state == "failed":
+                st.error("La recherche des règles en conflit a échoué.")
+                st.code(diagnosis.error)
+            elif diagnosis is not None and diagnosis.result is not None:
+                conflicts = diagnosis.result.conflicts
+                if not conflicts:
+                    st.warning("Aucun conflit trouvé dans le temps imparti.")
+        for conflict in conflicts or ():
+            st.error(conflict.describe())
+        st.info("Assouplissez une ou plusieurs règles pour obtenir le planning qui les enfreint le moins.")
+
+if stored_history:
+    with st.expander("Compteurs cumulés des semaines validées"):
+        st.write(pd.DataFrame({e: {"semaines": entry["weeks"], **entry["counts"]}
+                               for e, entry in stored_history.items()}).T)
+        if st.button("Effacer l'historique"):
+            save_to_local_storage(HISTORY_KEY, {})
+            st.rerun()